@@ -9,21 +9,27 @@ load_dotenv()
 langfuse = get_client() 
 langfuse_callback_handler = CallbackHandler() 
 
-langfuse.create_prompt(
-    name="event-planner",
-    prompt=
-    "Plan an event titled {{Event_Name}}. The event will be about: {{Event_Description}}. "
-    "The event will be held in {{Location}} on {{Date}}. "
-    "Consider the following factors: audience, budget, venue, catering options, and entertainment. "
-    "Provide a detailed plan including potential vendors and logistics.",
-    config={
-        "model":"claude4_sonnet",
-        "temperature": 0,
-    },
-    labels=["production"]
-)
-
-langfuse_prompt = langfuse.get_prompt("event-planner")
+# Fetch the prompt first and only create it if it doesn't exist yet; the
+# original flow paid the create + fetch round-trips on every start. The SDK
+# caches fetches client-side for cache_ttl_seconds, so repeated lookups in
+# the same process are free.
+try:
+    langfuse_prompt = langfuse.get_prompt("event-planner", cache_ttl_seconds=300)
+except Exception:
+    langfuse.create_prompt(
+        name="event-planner",
+        prompt=
+        "Plan an event titled {{Event_Name}}. The event will be about: {{Event_Description}}. "
+        "The event will be held in {{Location}} on {{Date}}. "
+        "Consider the following factors: audience, budget, venue, catering options, and entertainment. "
+        "Provide a detailed plan including potential vendors and logistics.",
+        config={
+            "model":"claude4_sonnet",
+            "temperature": 0,
+        },
+        labels=["production"]
+    )
+    langfuse_prompt = langfuse.get_prompt("event-planner", cache_ttl_seconds=300)
 
 model_name = langfuse_prompt.config["model"]
 temperature = str(langfuse_prompt.config["temperature"])
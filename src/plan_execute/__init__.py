@@ -0,0 +1,6 @@
+# Deliberately empty: importing plan_execute.agent.service (and through it
+# plan_execute.agent.nodes) builds LLM clients, the react agent and tracing
+# handlers at import time. A package-level re-export of get_graph forced all
+# of that on anyone importing any plan_execute submodule — e.g. a client
+# script that only wants plan_execute.config. Import get_graph from
+# plan_execute.agent.service instead.
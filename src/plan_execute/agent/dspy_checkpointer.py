@@ -2,55 +2,445 @@
 Custom conversation persistence checkpointer for DSPy.
 This replaces LangGraph's PostgreSQL checkpointer with a DSPy-compatible solution.
 """
-import json
+import asyncio
 import logging
+import time
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional
-from psycopg_pool import AsyncConnectionPool
+
+import asyncpg
+import orjson
 import dspy
 
+from plan_execute.config import settings
+
 logger = logging.getLogger("dspy_checkpointer")
 
+# Hot-path SQL lives in module constants: asyncpg keys its per-connection
+# prepared-statement cache on the query string, so a stable object means
+# every call after the first skips parse/plan entirely.
+_SQL_APPEND_MESSAGE = """
+    INSERT INTO dspy_conversation_messages (thread_id, payload)
+    VALUES ($1, $2)
+"""
+
+_SQL_SAVE_CONVERSATION = """
+    INSERT INTO dspy_conversations (thread_id, history, updated_at)
+    VALUES ($1, $2, CURRENT_TIMESTAMP)
+    ON CONFLICT (thread_id)
+    DO UPDATE SET
+        history = EXCLUDED.history,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# Text-parameter variant: takes pre-encoded JSON and casts server-side,
+# bypassing the jsonb codec so histories encoded off-loop aren't encoded
+# twice.
+_SQL_SAVE_CONVERSATION_TEXT = """
+    INSERT INTO dspy_conversations (thread_id, history, updated_at)
+    VALUES ($1, $2::jsonb, CURRENT_TIMESTAMP)
+    ON CONFLICT (thread_id)
+    DO UPDATE SET
+        history = EXCLUDED.history,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# Histories longer than this get encoded in a worker thread; encoding a
+# multi-hundred-message blob on the event loop stalls every concurrent
+# stream sharing it.
+_OFFLOAD_ENCODE_THRESHOLD = 256
+
+# Append the new turn and pull back the recent history in one statement.
+# The SELECT runs against the pre-insert snapshot (data-modifying CTEs are
+# invisible to the rest of the query), so it returns exactly the prior
+# messages; the caller tacks the new turn on locally.
+_SQL_APPEND_AND_SNAPSHOT = """
+    WITH inserted AS (
+        INSERT INTO dspy_conversation_messages (thread_id, payload)
+        VALUES ($1, $2)
+        RETURNING message_seq
+    )
+    SELECT payload FROM dspy_conversation_messages
+    WHERE thread_id = $1
+    ORDER BY message_seq DESC
+    LIMIT $3
+"""
+
+_SQL_LOAD_MESSAGES = """
+    SELECT payload FROM dspy_conversation_messages
+    WHERE thread_id = $1
+    ORDER BY message_seq
+"""
+
+_SQL_LOAD_LEGACY_BLOB = """
+    SELECT history FROM dspy_conversations
+    WHERE thread_id = $1
+"""
+
+_SQL_DELETE_MESSAGES = """
+    DELETE FROM dspy_conversation_messages
+    WHERE thread_id = $1
+"""
+
+_SQL_DELETE_CONVERSATION = """
+    DELETE FROM dspy_conversations
+    WHERE thread_id = $1
+"""
+
+# Listing and cleanup derive conversation metadata from the append-only
+# messages table — append_message never touches dspy_conversations, so its
+# updated_at goes stale the moment a thread is on the new schema. Legacy
+# blob-only threads are unioned in so they stay visible until migrated.
+_SQL_LIST_CONVERSATIONS = """
+    SELECT thread_id, message_count, created_at, updated_at FROM (
+        SELECT thread_id,
+               count(*) AS message_count,
+               min(created_at) AS created_at,
+               max(created_at) AS updated_at
+        FROM dspy_conversation_messages
+        GROUP BY thread_id
+        UNION ALL
+        SELECT c.thread_id,
+               jsonb_array_length(c.history),
+               c.created_at,
+               c.updated_at
+        FROM dspy_conversations c
+        WHERE NOT EXISTS (
+            SELECT 1 FROM dspy_conversation_messages m
+            WHERE m.thread_id = c.thread_id
+        )
+    ) conversations
+    ORDER BY updated_at DESC
+    LIMIT $1
+"""
+
+# Staleness is judged per thread on its newest message, so an old but
+# still-active conversation never loses its early rows; a stale thread is
+# dropped whole. LIMIT bounds the threads (not rows) per batch, which keeps
+# each transaction's lock footprint small even for very long threads.
+_SQL_CLEANUP_MESSAGES_BATCH = """
+    DELETE FROM dspy_conversation_messages
+    WHERE thread_id = ANY (ARRAY(
+        SELECT thread_id FROM dspy_conversation_messages
+        GROUP BY thread_id
+        HAVING max(created_at) < CURRENT_TIMESTAMP - make_interval(days => $1)
+        LIMIT 100
+    ))
+"""
+
+_SQL_CLEANUP_BATCH = """
+    DELETE FROM dspy_conversations
+    WHERE ctid = ANY (ARRAY(
+        SELECT ctid FROM dspy_conversations
+        WHERE updated_at < CURRENT_TIMESTAMP - make_interval(days => $1)
+        LIMIT 5000
+    ))
+"""
+
+# Below this many rows, COPY's setup overhead outweighs its streaming wins
+# and executemany is the better bulk path.
+_COPY_THRESHOLD = 1024
+
+# At most this many threads keep a cached history in memory; least
+# recently used threads fall out first.
+_HIST_CACHE_MAX = 1024
+
+_SQL_COMPACT_SELECT = """
+    SELECT message_seq, payload FROM dspy_conversation_messages
+    WHERE thread_id = $1
+    ORDER BY message_seq
+"""
+
+_SQL_COMPACT_DELETE = """
+    DELETE FROM dspy_conversation_messages
+    WHERE thread_id = $1 AND message_seq <= $2
+"""
+
+_SQL_INSERT_WITH_SEQ = """
+    INSERT INTO dspy_conversation_messages (thread_id, message_seq, payload)
+    VALUES ($1, $2, $3)
+"""
+
+
+def _summarize_messages(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold a run of old messages into one heuristic summary dict.
+
+    Prior summary rows are merged in, so repeated compactions stay one
+    summary deep. Key points are clipped openings rather than an LLM
+    digest; enough for the model to keep thread context without paying
+    for the full transcript.
+
+    The row doubles as a regular history turn: dspy renders messages by
+    the signature's field names, so the digest has to live in
+    user_message/response — anything else is invisible to the model.
+    The type marker plus count/key_points stay alongside for the
+    merge-on-recompaction path above.
+    """
+    count = 0
+    key_points: List[str] = []
+    for message in messages:
+        if message.get("type") == "summary":
+            count += message.get("count", 0)
+            key_points.extend(message.get("key_points", []))
+            continue
+        count += 1
+        text = message.get("user_message") or message.get("response") or ""
+        if text:
+            key_points.append(" ".join(str(text).split()[:12]))
+    return {
+        "type": "summary",
+        "count": count,
+        "key_points": key_points,
+        "user_message": f"[Summary of {count} earlier turns in this conversation]",
+        "response": "Key points so far: " + "; ".join(key_points),
+    }
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Register a JSONB codec so history round-trips as Python lists/dicts.
+
+    Both directions go through orjson — several times faster than stdlib
+    json, and load is the hotter side since every turn starts by decoding
+    the thread's history. asyncpg wants text on the encode side, so those
+    bytes are decoded once.
+    """
+    await conn.set_type_codec(
+        "jsonb",
+        encoder=lambda value: orjson.dumps(value).decode(),
+        decoder=orjson.loads,
+        schema="pg_catalog",
+    )
+
 
 class DSPyConversationCheckpointer:
     """
     Custom checkpointer for DSPy conversations using PostgreSQL.
     Stores and retrieves conversation history for thread-based persistence.
+
+    Backed by asyncpg rather than psycopg: the streaming hot path does a
+    load + save per turn, and asyncpg's native binary protocol and
+    automatic prepared statements make those round-trips markedly cheaper.
     """
-    
-    def __init__(self, pool: AsyncConnectionPool):
-        self.pool = pool
-        
+
+    def __init__(self, dsn: str = None, max_history_messages: int = None, summary_threshold: int = None):
+        self.dsn = dsn or settings.postgres_dsn
+        self.pool: Optional[asyncpg.Pool] = None
+        # Compaction bounds: once a thread exceeds max_history_messages,
+        # the oldest summary_threshold // 2 turns collapse into a single
+        # summary row, capping per-turn DB I/O and prompt size. Defaults
+        # come from settings so deploys can tune them per workload.
+        self.max_history_messages = max_history_messages or settings.history_max_messages
+        self.summary_threshold = summary_threshold or settings.history_summary_threshold
+        # Short-TTL history cache: sticky threads chat with the same
+        # process, so the history we just wrote is almost always the one
+        # the next turn re-loads. Per-thread locks stop a cold miss from
+        # fanning out into concurrent identical fetches. LRU-bounded so a
+        # long tail of one-off threads can't grow it without limit.
+        self._hist_cache: OrderedDict = OrderedDict()
+        self._hist_locks: Dict[str, asyncio.Lock] = {}
+        self._keepalive_task: Optional[asyncio.Task] = None
+
     async def setup(self):
-        """Initialize the database tables for conversation storage."""
-        async with self.pool.connection() as conn:
-            # Create table for storing conversation history
+        """Create the connection pool and database tables for conversation storage."""
+        if self.pool is None:
+            # Sizing comes from settings so deploys can match Postgres
+            # max_connections; idle timeout is disabled (lifetime=0) and a
+            # keep-alive ping below keeps connections warm, so the first
+            # turn after a quiet spell never pays a fresh connect.
+            self.pool = await asyncpg.create_pool(
+                self.dsn,
+                min_size=settings.pool_min_size,
+                max_size=settings.pool_max_size,
+                max_inactive_connection_lifetime=0,
+                max_queries=50_000,
+                # Room for every distinct query in this module on each
+                # connection, with headroom; cached statements execute
+                # without a parse/plan round-trip. Behind a transaction-
+                # pooling pgbouncer the cache must be off entirely: a
+                # prepared statement lives on one server connection and
+                # the next transaction may run on a different one.
+                statement_cache_size=(
+                    0 if settings.postgres_transaction_pooling else 256
+                ),
+                init=_init_connection,
+            )
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+
+        async with self.pool.acquire() as conn:
+            # All DDL in one multi-statement round-trip. Notes:
+            # - no index on thread_id: the PRIMARY KEY already provides one,
+            #   and the old idx_dspy_conversations_thread_id duplicate only
+            #   added write amplification, so it is dropped here.
+            # - idx_dspy_conversations_updated_at serves cleanup queries.
+            # - dspy_conversation_messages is the append-only per-message
+            #   store; each turn inserts one row instead of rewriting the
+            #   history blob, and load order is fixed by message_seq so the
+            #   serialized prefix never changes.
             await conn.execute("""
                 CREATE TABLE IF NOT EXISTS dspy_conversations (
                     thread_id TEXT PRIMARY KEY,
                     history JSONB NOT NULL DEFAULT '[]',
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Create index for faster lookups
-            await conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_dspy_conversations_thread_id 
-                ON dspy_conversations(thread_id)
-            """)
-            
-            # Create index for updated_at for cleanup queries
-            await conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_dspy_conversations_updated_at 
-                ON dspy_conversations(updated_at)
+                );
+                DROP INDEX IF EXISTS idx_dspy_conversations_thread_id;
+                CREATE INDEX IF NOT EXISTS idx_dspy_conversations_updated_at
+                ON dspy_conversations(updated_at);
+                CREATE TABLE IF NOT EXISTS dspy_conversation_messages (
+                    thread_id TEXT NOT NULL,
+                    message_seq BIGSERIAL,
+                    payload JSONB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (thread_id, message_seq)
+                );
             """)
-            
+
             logger.info("DSPy conversation checkpointer initialized")
-    
+
+    async def _keepalive_loop(self):
+        """Ping the pool periodically so idle connections stay warm."""
+        while True:
+            await asyncio.sleep(settings.pool_keepalive_interval)
+            try:
+                async with self.pool.acquire() as conn:
+                    await conn.fetchval("SELECT 1")
+            except Exception as e:
+                logger.warning(f"Pool keep-alive ping failed: {e}")
+
+    async def aclose(self):
+        """Close the pool; call once at shutdown."""
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def append_message(self, thread_id: str, message: Dict[str, Any]):
+        """
+        Append a single conversation turn to PostgreSQL.
+
+        This is the per-turn persistence path: one INSERT of the new
+        {user_message, response} row, constant cost regardless of how long
+        the conversation is. Prior rows are never rewritten, keeping the
+        serialized history prefix byte-stable for provider prompt caching.
+
+        The same statement also returns the recent prior messages, which
+        refreshes the in-process history cache — so the next turn's load
+        is a cache hit and each turn costs one DB round-trip, not two.
+
+        Args:
+            thread_id: Unique identifier for the conversation thread
+            message: The new turn, e.g. {"user_message": ..., "response": ...}
+        """
+        try:
+            cached = self._hist_cache.get(thread_id)
+            if cached is not None and cached[0] > time.monotonic():
+                # Warm thread: the cached history is current, so append the
+                # new turn in place — O(1), no list rebuild — and write just
+                # the insert.
+                history = cached[1]
+                history.messages.append(message)
+                self._cache_put(thread_id, history)
+                async with self.pool.acquire() as conn:
+                    await conn.execute(_SQL_APPEND_MESSAGE, thread_id, message)
+                messages = history.messages
+            else:
+                # Cold thread: insert and pull the prior history back in the
+                # same statement, then seed the cache with the new turn
+                # appended.
+                async with self.pool.acquire() as conn:
+                    rows = await conn.fetch(
+                        _SQL_APPEND_AND_SNAPSHOT, thread_id, message, self.max_history_messages
+                    )
+                messages = [row["payload"] for row in rows]
+                messages.reverse()
+                messages.append(message)
+                self._cache_put(thread_id, dspy.History(messages=messages))
+
+            logger.info(f"Appended message for thread {thread_id}")
+
+            if len(messages) > self.max_history_messages:
+                await self.compact_history(thread_id)
+
+        except Exception as e:
+            logger.error(f"Failed to append message for thread {thread_id}: {e}")
+            raise
+
+    async def compact_history(self, thread_id: str):
+        """
+        Collapse the oldest messages of an over-long thread into one summary.
+
+        Keeps the sliding window bounded: when a thread passes
+        max_history_messages, the oldest summary_threshold // 2 rows are
+        replaced by a single kind='summary' row that reuses the lowest
+        deleted message_seq, so ordering — and the serialized prefix after
+        the summary — stays stable until the next compaction.
+
+        Args:
+            thread_id: Unique identifier for the conversation thread
+        """
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    rows = await conn.fetch(_SQL_COMPACT_SELECT, thread_id)
+                    if len(rows) <= self.max_history_messages:
+                        return
+
+                    window = rows[: self.summary_threshold // 2]
+                    summary = _summarize_messages([row["payload"] for row in window])
+                    first_seq = window[0]["message_seq"]
+                    last_seq = window[-1]["message_seq"]
+
+                    await conn.execute(_SQL_COMPACT_DELETE, thread_id, last_seq)
+                    await conn.execute(_SQL_INSERT_WITH_SEQ, thread_id, first_seq, summary)
+
+            self._hist_cache.pop(thread_id, None)
+            logger.info(
+                f"Compacted thread {thread_id}: {len(window)} messages folded into a summary"
+            )
+
+        except Exception as e:
+            logger.error(f"Failed to compact history for thread {thread_id}: {e}")
+            # Compaction is opportunistic; the thread still works uncompacted
+
+    async def bulk_import(self, rows: List[tuple]):
+        """
+        Bulk-load (thread_id, payload) message rows, e.g. imported transcripts.
+
+        Small batches go through executemany; past _COPY_THRESHOLD rows the
+        COPY protocol takes over, which is an order of magnitude faster than
+        row-by-row INSERTs on large migrations.
+
+        Args:
+            rows: (thread_id, payload) tuples in conversation order
+        """
+        if not rows:
+            return
+        try:
+            async with self.pool.acquire() as conn:
+                if len(rows) >= _COPY_THRESHOLD:
+                    await conn.copy_records_to_table(
+                        "dspy_conversation_messages",
+                        records=rows,
+                        columns=["thread_id", "payload"],
+                    )
+                else:
+                    await conn.executemany(_SQL_APPEND_MESSAGE, rows)
+
+                logger.info(f"Bulk-imported {len(rows)} messages")
+
+        except Exception as e:
+            logger.error(f"Failed to bulk-import {len(rows)} messages: {e}")
+            raise
+
     async def save_conversation(self, thread_id: str, history: dspy.History):
         """
-        Save conversation history to PostgreSQL.
-        
+        Save the full conversation history to PostgreSQL in one write.
+
+        Bulk path for imports/migrations; per-turn persistence should use
+        append_message instead of rewriting the history blob every turn.
+
         Args:
             thread_id: Unique identifier for the conversation thread
             history: DSPy History object containing conversation messages
@@ -60,129 +450,186 @@ class DSPyConversationCheckpointer:
             history_data = []
             if history and hasattr(history, 'messages') and history.messages:
                 history_data = history.messages
-            
-            async with self.pool.connection() as conn:
-                # Use upsert to insert or update
-                await conn.execute("""
-                    INSERT INTO dspy_conversations (thread_id, history, updated_at)
-                    VALUES (%s, %s, CURRENT_TIMESTAMP)
-                    ON CONFLICT (thread_id) 
-                    DO UPDATE SET 
-                        history = EXCLUDED.history,
-                        updated_at = CURRENT_TIMESTAMP
-                """, (thread_id, json.dumps(history_data)))
-                
+
+            async with self.pool.acquire() as conn:
+                # Use upsert to insert or update. Big histories are encoded
+                # off-loop and sent as text; the codec handles the rest.
+                if len(history_data) > _OFFLOAD_ENCODE_THRESHOLD:
+                    payload = await asyncio.to_thread(
+                        lambda: orjson.dumps(history_data).decode()
+                    )
+                    await conn.execute(_SQL_SAVE_CONVERSATION_TEXT, thread_id, payload)
+                else:
+                    await conn.execute(_SQL_SAVE_CONVERSATION, thread_id, history_data)
+
+                self._cache_put(thread_id, dspy.History(messages=list(history_data)))
+
                 logger.info(f"Saved conversation for thread {thread_id} with {len(history_data)} messages")
-                
+
         except Exception as e:
             logger.error(f"Failed to save conversation for thread {thread_id}: {e}")
             raise
-    
+
+    def _cache_put(self, thread_id: str, history: dspy.History, ttl: float = 60.0):
+        """Insert/refresh a cache entry, evicting the LRU thread past the cap."""
+        self._hist_cache[thread_id] = (time.monotonic() + ttl, history)
+        self._hist_cache.move_to_end(thread_id)
+        while len(self._hist_cache) > _HIST_CACHE_MAX:
+            evicted, _ = self._hist_cache.popitem(last=False)
+            self._hist_locks.pop(evicted, None)
+
+    async def load_cached(self, thread_id: str, ttl: float = 60.0) -> dspy.History:
+        """
+        Load conversation history, serving repeat reads from memory.
+
+        The common chat pattern is one load per turn on the same thread;
+        within the TTL window that read is a dict lookup instead of a DB
+        round-trip. Writes through append_message, save_conversation and
+        delete_conversation keep the cache coherent.
+
+        Args:
+            thread_id: Unique identifier for the conversation thread
+            ttl: Seconds a cached history stays fresh
+
+        Returns:
+            DSPy History object with the conversation messages
+        """
+        entry = self._hist_cache.get(thread_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._hist_cache.move_to_end(thread_id)
+            return entry[1]
+
+        lock = self._hist_locks.setdefault(thread_id, asyncio.Lock())
+        async with lock:
+            # Another waiter may have filled the cache while we slept
+            entry = self._hist_cache.get(thread_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._hist_cache.move_to_end(thread_id)
+                return entry[1]
+            history = await self.load_conversation(thread_id)
+            self._cache_put(thread_id, history, ttl)
+            return history
+
     async def load_conversation(self, thread_id: str) -> dspy.History:
         """
         Load conversation history from PostgreSQL.
-        
+
         Args:
             thread_id: Unique identifier for the conversation thread
-            
+
         Returns:
             DSPy History object with loaded conversation messages
         """
         try:
-            async with self.pool.connection() as conn:
-                cursor = await conn.execute("""
-                    SELECT history FROM dspy_conversations 
-                    WHERE thread_id = %s
-                """, (thread_id,))
-                
-                row = await cursor.fetchone()
-                
-                if row and row[0]:
-                    history_data = row[0]  # JSONB is automatically parsed
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(_SQL_LOAD_MESSAGES, thread_id)
+
+                if rows:
+                    history_data = [row['payload'] for row in rows]
                     logger.info(f"Loaded conversation for thread {thread_id} with {len(history_data)} messages")
                     return dspy.History(messages=history_data)
+
+                # Fall back to the legacy blob table for threads that predate
+                # the append-only schema.
+                history_data = await conn.fetchval(_SQL_LOAD_LEGACY_BLOB, thread_id)
+
+                if history_data:
+                    logger.info(f"Loaded legacy conversation for thread {thread_id} with {len(history_data)} messages")
+                    return dspy.History(messages=history_data)
                 else:
                     logger.info(f"No existing conversation found for thread {thread_id}")
                     return dspy.History(messages=[])
-                    
+
         except Exception as e:
             logger.error(f"Failed to load conversation for thread {thread_id}: {e}")
             # Return empty history on error to allow conversation to continue
             return dspy.History(messages=[])
-    
+
     async def delete_conversation(self, thread_id: str):
         """
         Delete conversation history for a specific thread.
-        
+
         Args:
             thread_id: Unique identifier for the conversation thread
         """
         try:
-            async with self.pool.connection() as conn:
-                await conn.execute("""
-                    DELETE FROM dspy_conversations 
-                    WHERE thread_id = %s
-                """, (thread_id,))
-                
+            async with self.pool.acquire() as conn:
+                await conn.execute(_SQL_DELETE_MESSAGES, thread_id)
+                await conn.execute(_SQL_DELETE_CONVERSATION, thread_id)
+
+                self._hist_cache.pop(thread_id, None)
+
                 logger.info(f"Deleted conversation for thread {thread_id}")
-                
+
         except Exception as e:
             logger.error(f"Failed to delete conversation for thread {thread_id}: {e}")
             raise
-    
+
     async def list_conversations(self, limit: int = 100) -> List[Dict[str, Any]]:
         """
         List recent conversations.
-        
+
         Args:
             limit: Maximum number of conversations to return
-            
+
         Returns:
             List of conversation metadata
         """
         try:
-            async with self.pool.connection() as conn:
-                cursor = await conn.execute("""
-                    SELECT thread_id, 
-                           jsonb_array_length(history) as message_count,
-                           created_at, 
-                           updated_at
-                    FROM dspy_conversations 
-                    ORDER BY updated_at DESC 
-                    LIMIT %s
-                """, (limit,))
-                
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(_SQL_LIST_CONVERSATIONS, limit)
+
                 conversations = []
-                async for row in cursor:
+                for row in rows:
                     conversations.append({
-                        'thread_id': row[0],
-                        'message_count': row[1] or 0,
-                        'created_at': row[2],
-                        'updated_at': row[3]
+                        'thread_id': row['thread_id'],
+                        'message_count': row['message_count'] or 0,
+                        'created_at': row['created_at'],
+                        'updated_at': row['updated_at']
                     })
-                
+
                 return conversations
-                
+
         except Exception as e:
             logger.error(f"Failed to list conversations: {e}")
             return []
-    
+
     async def cleanup_old_conversations(self, days_old: int = 30):
         """
         Clean up old conversations to prevent database bloat.
-        
+
         Args:
             days_old: Delete conversations older than this many days
         """
         try:
-            async with self.pool.connection() as conn:
-                await conn.execute("""
-                    DELETE FROM dspy_conversations 
-                    WHERE updated_at < CURRENT_TIMESTAMP - INTERVAL '%s days'
-                """, (days_old,))
-                
-                logger.info(f"Cleaned up old conversations (older than {days_old} days)")
-                
+            # Delete in bounded batches so a big backlog never holds locks
+            # for the whole table at once. The messages table is the live
+            # store and the one that actually grows, so it goes first; the
+            # legacy blob batch comes from an index range scan on
+            # idx_dspy_conversations_updated_at, and SET LOCAL
+            # random_page_cost nudges the planner toward it on installs
+            # still tuned for spinning disks.
+            total_deleted = 0
+            while True:
+                async with self.pool.acquire() as conn:
+                    status = await conn.execute(_SQL_CLEANUP_MESSAGES_BATCH, days_old)
+                deleted = int(status.rsplit(" ", 1)[-1])
+                total_deleted += deleted
+                if deleted == 0:
+                    break
+
+            while True:
+                async with self.pool.acquire() as conn:
+                    async with conn.transaction():
+                        await conn.execute("SET LOCAL random_page_cost = 1.1")
+                        status = await conn.execute(_SQL_CLEANUP_BATCH, days_old)
+                deleted = int(status.rsplit(" ", 1)[-1])
+                total_deleted += deleted
+                if deleted == 0:
+                    break
+
+            logger.info(f"Cleaned up {total_deleted} old conversation rows (older than {days_old} days)")
+
         except Exception as e:
             logger.error(f"Failed to cleanup old conversations: {e}")
-            raise
\ No newline at end of file
+            raise
@@ -3,18 +3,28 @@ Enhanced DSPy service with MCP (Model Context Protocol) tool integration.
 Extends the base DSPy service with airline booking and management capabilities.
 """
 import logging
-import json
 import time
+import uuid
 import asyncio
+from contextlib import AsyncExitStack
 from typing import Dict, Any, AsyncGenerator, List
 from pydantic import BaseModel
 
-from psycopg_pool import AsyncConnectionPool
 import dspy
+import orjson
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
 from plan_execute.agent.models import ChatRequest
+from plan_execute.agent.sse import (
+    CONTENT_FRAME_TMPL,
+    DONE_FRAME,
+    FINAL_FRAME_TMPL,
+    FLUSH_TICK,
+    ROLE_FRAME_TMPL,
+    aiter_with_flush_ticks,
+    content_frame_template,
+)
 from plan_execute.agent.dspy_checkpointer import DSPyConversationCheckpointer
 from plan_execute.config import settings
 
@@ -24,6 +34,8 @@ load_dotenv()
 
 logger = logging.getLogger("dspy_mcp_service")
 
+_MODEL = b"claude4_sonnet"
+
 
 class DSPyMCPChatResponse(BaseModel):
     response: str
@@ -44,69 +56,80 @@ class DSPyMCPAgentService:
     Provides streaming chat with tool execution and conversation persistence.
     """
 
-    def __init__(self, pool: AsyncConnectionPool, mcp_server_path: str = None) -> None:
-        self.checkpointer = DSPyConversationCheckpointer(pool)
-        self.pool = pool
-        
-        # MCP server configuration
-        self.mcp_server_path = mcp_server_path or "/Users/thomas.wood/src/plan-execute-langgraph/mcp_server.py"
+    def __init__(self, mcp_server_path: str = None) -> None:
+        # Conversation persistence runs on its own asyncpg pool (binary
+        # protocol, prepared-statement cache) managed by the checkpointer.
+        self.checkpointer = DSPyConversationCheckpointer()
+
+        # MCP server configuration - co-locate with this service
+        import os
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        self.mcp_server_path = mcp_server_path or os.path.join(current_dir, "mcp_server.py")
         self.mcp_tools = []
+
+        # One MCP server subprocess and session for the service lifetime;
+        # the exit stack unwinds both on aclose().
+        self._mcp_stack = AsyncExitStack()
+        self.mcp_session = None
         
-        # Configure DSPy with the same LLM settings as the original service
-        self.lm = self._configure_dspy_lm()
-        dspy.configure(lm=self.lm)
-        
+        # LM construction is deferred to initialize(): dspy.LM drags in
+        # litellm on first build, and doing that in the constructor stalls
+        # whatever loop creates the service.
+        self.lm = None
+
         # This will be initialized with MCP tools in initialize()
         self.react_agent = None
 
     def _configure_dspy_lm(self):
-        """Configure DSPy LM with the same settings as the original service."""
-        try:
-            # Try OpenAI-compatible configuration first
-            return dspy.LM(
-                model="openai/claude4_sonnet",
-                api_base=settings.openai_base_url,
-                api_key=settings.openai_api_key.get_secret_value(),
-            )
-        except Exception as e:
-            logger.warning(f"Failed to configure OpenAI-compatible LM: {e}")
-            try:
-                # Fallback to direct model name
-                return dspy.LM(
-                    model="claude4_sonnet",
-                    api_base=settings.openai_base_url,
-                    api_key=settings.openai_api_key.get_secret_value(),
-                )
-            except Exception as e2:
-                logger.error(f"Failed to configure DSPy LM: {e2}")
-                raise Exception(f"Could not configure DSPy LM: {e2}")
+        """Configure DSPy LM with the same settings as the original service.
+
+        Construction never touches the provider — a bad prefix or endpoint
+        only fails at the first call — so there is nothing to catch here
+        and the openai/ variant is built exactly once.
+        """
+        api_key = settings.openai_api_key.get_secret_value()
+        return dspy.LM(
+            model="openai/claude4_sonnet",
+            api_base=settings.openai_base_url,
+            api_key=api_key,
+        )
 
     async def _initialize_mcp_tools(self) -> List[dspy.Tool]:
-        """Initialize MCP tools by connecting to the MCP server."""
+        """Open the persistent MCP session and wrap its tools for DSPy.
+
+        The stdio transport and session are entered on the service's exit
+        stack and stay open for its lifetime, so tool calls reuse the
+        already-running server subprocess instead of forking and
+        re-handshaking per invocation.
+        """
         server_params = StdioServerParameters(
             command="python",
             args=[self.mcp_server_path],
             env=None,
         )
-        
+
         try:
-            async with stdio_client(server_params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    # Initialize the connection
-                    await session.initialize()
-                    
-                    # List available tools
-                    tools = await session.list_tools()
-                    
-                    # Convert MCP tools to DSPy tools
-                    dspy_tools = []
-                    for tool in tools.tools:
-                        dspy_tool = dspy.Tool.from_mcp_tool(session, tool)
-                        dspy_tools.append(dspy_tool)
-                    
-                    logger.info(f"Successfully initialized {len(dspy_tools)} MCP tools")
-                    return dspy_tools
-                    
+            read, write = await self._mcp_stack.enter_async_context(
+                stdio_client(server_params)
+            )
+            session = await self._mcp_stack.enter_async_context(
+                ClientSession(read, write)
+            )
+            # Initialize the connection
+            await session.initialize()
+            self.mcp_session = session
+
+            # List available tools
+            tools = await session.list_tools()
+
+            # Convert MCP tools to DSPy tools bound to the live session
+            dspy_tools = [
+                dspy.Tool.from_mcp_tool(session, tool) for tool in tools.tools
+            ]
+
+            logger.info(f"Successfully initialized {len(dspy_tools)} MCP tools")
+            return dspy_tools
+
         except Exception as e:
             logger.error(f"Failed to initialize MCP tools: {e}")
             raise Exception(f"Could not initialize MCP tools: {e}")
@@ -114,12 +137,17 @@ class DSPyMCPAgentService:
     async def initialize(self) -> None:
         """One-time setup; call once at start-up."""
         try:
-            # Initialize the checkpointer
-            await self.checkpointer.setup()
-            
-            # Initialize MCP tools
-            self.mcp_tools = await self._initialize_mcp_tools()
-            
+            # LM construction (thread, it's sync and import-heavy), the
+            # checkpointer DDL and the MCP handshake have no dependencies
+            # on each other, so run them concurrently: startup costs
+            # max(component) instead of sum(component).
+            self.lm, _, self.mcp_tools = await asyncio.gather(
+                asyncio.to_thread(self._configure_dspy_lm),
+                self.checkpointer.setup(),
+                self._initialize_mcp_tools(),
+            )
+            dspy.configure(lm=self.lm)
+
             # Create the ReAct agent with tools
             self.react_agent = dspy.ReAct(AirlineServiceSignature, tools=self.mcp_tools)
             
@@ -136,7 +164,14 @@ class DSPyMCPAgentService:
             logger.error(f"Error initializing DSPy MCP service: {e}")
             raise e
 
-    async def chat_stream(self, req: ChatRequest) -> AsyncGenerator[str, None]:
+    async def aclose(self) -> None:
+        """Tear down the persistent MCP session, then the checkpointer's
+        asyncpg pool and keep-alive task."""
+        self.mcp_session = None
+        await self._mcp_stack.aclose()
+        await self.checkpointer.aclose()
+
+    async def chat_stream(self, req: ChatRequest) -> AsyncGenerator[bytes, None]:
         """
         Stream chat responses with MCP tool execution and proper state persistence.
         
@@ -146,7 +181,7 @@ class DSPyMCPAgentService:
         logger.info("Processing DSPy MCP streaming chat for thread_id=%s message=%r", req.thread_id, req.message)
         
         # Validate message
-        if not req.message or not req.message.strip():
+        if not req.message or req.message.isspace():
             logger.warning("Empty message received, providing default response")
             error_response = "I didn't receive a message. Please type something and try again."
             
@@ -156,172 +191,134 @@ class DSPyMCPAgentService:
             return
         
         try:
-            # Load conversation history from PostgreSQL
-            history = await self.checkpointer.load_conversation(req.thread_id)
+            # Load conversation history (memory within the TTL window,
+            # PostgreSQL otherwise)
+            history = await self.checkpointer.load_cached(req.thread_id)
             
             logger.info(f"Thread ID: {req.thread_id}")
             logger.info(f"Retrieved {len(history.messages) if history.messages else 0} existing messages from DSPy checkpointer")
             
-            # Use DSPy ReAct streaming to generate response with tool execution
-            chunk_id = f"chatcmpl-{int(time.time())}"
-            
+            # One timestamp per stream: created is the request time, and
+            # every frame this turn shares it. The envelope around each
+            # content frame is pre-rendered once; only the delta text is
+            # JSON-encoded per flush.
+            created = int(time.time())
+            chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            cid = chunk_id.encode()
+            frame_head, frame_tail = content_frame_template(chunk_id, created, "claude4_sonnet")
+
             # Send initial chunk
-            initial_chunk = {
-                "id": chunk_id,
-                "object": "chat.completion.chunk",
-                "created": int(time.time()),
-                "model": "claude4_sonnet",
-                "choices": [{
-                    "index": 0,
-                    "delta": {"role": "assistant", "content": ""},
-                    "finish_reason": None
-                }]
-            }
-            yield f"data: {json.dumps(initial_chunk)}\n\n"
+            yield ROLE_FRAME_TMPL % (cid, created, _MODEL)
             
             # Stream the DSPy ReAct response
             full_response = ""
-            
+
+            # Coalesce token deltas: one SSE frame per ~coalesce_bytes of
+            # text or coalesce_ms of elapsed time, whichever comes first.
+            # ReAct emits many tiny deltas (reasoning plus tool chatter),
+            # so per-token frames mean one serialize + one socket write
+            # each; batching cuts both proportionally.
+            loop = asyncio.get_running_loop()
+            pending: List[str] = []
+            pending_len = 0
+            last_flush = loop.time()
+            coalesce_bytes = settings.stream_coalesce_bytes
+            coalesce_s = settings.stream_coalesce_ms / 1000.0
+
             # Call the streaming ReAct agent
             stream_generator = self.streaming_react(
                 history=history,
                 user_request=req.message
             )
-            
-            async for chunk in stream_generator:
+
+            # The tick wrapper makes the ms threshold a real timer: when
+            # the ReAct stream stalls on a tool call, buffered deltas go
+            # out within the window instead of sitting for the whole pause.
+            async for chunk in aiter_with_flush_ticks(stream_generator, coalesce_s):
+                if chunk is FLUSH_TICK:
+                    if pending:
+                        yield frame_head + orjson.dumps("".join(pending)) + frame_tail
+                        pending.clear()
+                        pending_len = 0
+                        last_flush = loop.time()
+                    continue
                 if isinstance(chunk, dspy.Prediction):
                     # This is the final prediction - extract the response
                     final_prediction = chunk
                     full_response = chunk.process_result
                     logger.debug(f"Final DSPy ReAct prediction: {chunk.process_result}")
-                elif hasattr(chunk, 'choices') and chunk.choices:
-                    # This is a ModelResponseStream from LiteLLM - extract content
-                    delta = chunk.choices[0].delta
-                    if hasattr(delta, 'content') and delta.content:
-                        content = delta.content
-                        logger.debug(f"DSPy streaming chunk: {repr(content)}")
-                        
-                        # Convert to OpenAI-compatible streaming format
-                        streaming_chunk = {
-                            "id": chunk_id,
-                            "object": "chat.completion.chunk",
-                            "created": int(time.time()),
-                            "model": "claude4_sonnet",
-                            "choices": [{
-                                "index": 0,
-                                "delta": {"content": content},
-                                "finish_reason": None
-                            }]
-                        }
-                        yield f"data: {json.dumps(streaming_chunk)}\n\n"
+                    continue
+
+                # Pull the delta text out of whichever chunk type arrived:
+                # ModelResponseStream from LiteLLM or a DSPy StreamResponse.
+                # One getattr probe each instead of hasattr-then-access —
+                # hasattr is a getattr plus exception handling internally,
+                # and this runs per token.
+                choices = getattr(chunk, 'choices', None)
+                if choices:
+                    content = getattr(choices[0].delta, 'content', None)
                 elif isinstance(chunk, dspy.streaming.StreamResponse):
-                    # This is a DSPy StreamResponse from listeners
-                    if hasattr(chunk, 'content') and chunk.content:
-                        content = chunk.content
-                        logger.debug(f"DSPy stream response: {repr(content)}")
-                        
-                        # Convert to OpenAI-compatible streaming format
-                        streaming_chunk = {
-                            "id": chunk_id,
-                            "object": "chat.completion.chunk",
-                            "created": int(time.time()),
-                            "model": "claude4_sonnet",
-                            "choices": [{
-                                "index": 0,
-                                "delta": {"content": content},
-                                "finish_reason": None
-                            }]
-                        }
-                        yield f"data: {json.dumps(streaming_chunk)}\n\n"
+                    content = chunk.content
                 else:
                     # Handle other chunk types (status messages, etc.)
                     logger.debug(f"Other DSPy chunk type: {type(chunk)} - {repr(chunk)}")
                     # Skip status messages to match original behavior
+                    continue
+                if not content:
+                    continue
+
+                pending.append(content)
+                pending_len += len(content)
+                now = loop.time()
+                if pending_len < coalesce_bytes and now - last_flush < coalesce_s:
+                    continue
+                yield frame_head + orjson.dumps("".join(pending)) + frame_tail
+                pending.clear()
+                pending_len = 0
+                last_flush = now
+
+            # Flush whatever the coalescing window was still holding
+            if pending:
+                yield frame_head + orjson.dumps("".join(pending)) + frame_tail
+                pending.clear()
+
+            # Send final chunk (pre-baked template; no dict build)
+            yield FINAL_FRAME_TMPL % (cid, created, _MODEL)
             
-            # Send final chunk
-            final_chunk = {
-                "id": chunk_id,
-                "object": "chat.completion.chunk",
-                "created": int(time.time()),
-                "model": "claude4_sonnet",
-                "choices": [{
-                    "index": 0,
-                    "delta": {},
-                    "finish_reason": "stop"
-                }]
-            }
-            yield f"data: {json.dumps(final_chunk)}\n\n"
-            
-            # Update conversation history with the new exchange
+            # Persist only the new turn: history rows are append-only, so the
+            # write cost is constant no matter how long the thread gets.
             try:
-                # Add the new user message and assistant response to history
-                updated_messages = history.messages.copy() if history.messages else []
-                updated_messages.append({
+                await self.checkpointer.append_message(req.thread_id, {
                     "user_message": req.message,
                     "response": full_response
                 })
-                
-                # Create updated history and save to PostgreSQL
-                updated_history = dspy.History(messages=updated_messages)
-                await self.checkpointer.save_conversation(req.thread_id, updated_history)
-                
-                logger.info(f"Successfully saved conversation state with {len(updated_messages)} messages")
-                
+                logger.info("Successfully saved conversation state")
+
             except Exception as e:
                 logger.error(f"Failed to save conversation state: {e}", exc_info=True)
                 # Continue anyway - the conversation still worked for this turn
             
             # Signal completion
-            yield "data: [DONE]\n\n"
+            yield DONE_FRAME
                     
         except Exception as exc:
             logger.exception("DSPy MCP streaming chat execution failed")
             async for chunk in self._stream_error_response(f"Error: {str(exc)}"):
                 yield chunk
 
-    async def _stream_error_response(self, error_message: str) -> AsyncGenerator[str, None]:
-        """Stream an error response in OpenAI-compatible format."""
-        chunk_id = f"chatcmpl-{int(time.time())}"
-        
-        initial_chunk = {
-            "id": chunk_id,
-            "object": "chat.completion.chunk",
-            "created": int(time.time()),
-            "model": "claude4_sonnet",
-            "choices": [{
-                "index": 0,
-                "delta": {"role": "assistant", "content": ""},
-                "finish_reason": None
-            }]
-        }
-        yield f"data: {json.dumps(initial_chunk)}\n\n"
-        
-        content_chunk = {
-            "id": chunk_id,
-            "object": "chat.completion.chunk",
-            "created": int(time.time()),
-            "model": "claude4_sonnet",
-            "choices": [{
-                "index": 0,
-                "delta": {"content": error_message},
-                "finish_reason": None
-            }]
-        }
-        yield f"data: {json.dumps(content_chunk)}\n\n"
-        
-        final_chunk = {
-            "id": chunk_id,
-            "object": "chat.completion.chunk",
-            "created": int(time.time()),
-            "model": "claude4_sonnet",
-            "choices": [{
-                "index": 0,
-                "delta": {},
-                "finish_reason": "stop"
-            }]
-        }
-        yield f"data: {json.dumps(final_chunk)}\n\n"
-        yield "data: [DONE]\n\n"
+    async def _stream_error_response(self, error_message: str) -> AsyncGenerator[bytes, None]:
+        """Stream an error response in OpenAI-compatible format.
+
+        The frames are %-formatted byte templates; only the error text
+        itself goes through a JSON string encode.
+        """
+        created = int(time.time())
+        cid = b"chatcmpl-" + uuid.uuid4().hex[:12].encode()
+
+        yield ROLE_FRAME_TMPL % (cid, created, _MODEL)
+        yield CONTENT_FRAME_TMPL % (cid, created, _MODEL, orjson.dumps(error_message))
+        yield FINAL_FRAME_TMPL % (cid, created, _MODEL)
+        yield DONE_FRAME
 
     async def chat(self, req: ChatRequest) -> DSPyMCPChatResponse:
         """
@@ -333,13 +330,13 @@ class DSPyMCPAgentService:
         logger.info("Processing DSPy MCP chat for thread_id=%s message=%r", req.thread_id, req.message)
         
         # Validate message
-        if not req.message or not req.message.strip():
+        if not req.message or req.message.isspace():
             logger.warning("Empty message received, providing default response")
             return DSPyMCPChatResponse(response="I didn't receive a message. Please type something and try again.")
         
         try:
             # Load conversation history
-            history = await self.checkpointer.load_conversation(req.thread_id)
+            history = await self.checkpointer.load_cached(req.thread_id)
             
             # Generate response using DSPy ReAct with tools
             prediction = await self.react_agent.acall(
@@ -349,16 +346,12 @@ class DSPyMCPAgentService:
             
             response_text = prediction.process_result
             
-            # Update conversation history
-            updated_messages = history.messages.copy() if history.messages else []
-            updated_messages.append({
+            # Persist only the new turn (append-only history)
+            await self.checkpointer.append_message(req.thread_id, {
                 "user_message": req.message,
                 "response": response_text
             })
-            
-            updated_history = dspy.History(messages=updated_messages)
-            await self.checkpointer.save_conversation(req.thread_id, updated_history)
-            
+
             return DSPyMCPChatResponse(response=response_text)
             
         except Exception as exc:
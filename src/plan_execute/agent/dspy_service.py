@@ -3,17 +3,29 @@ DSPy-based agent service that replaces the LangGraph implementation.
 Provides streaming chat with conversation history and persistence.
 Enhanced with MCP (Model Context Protocol) tools for airline booking.
 """
+import asyncio
 import logging
-import json
 import time
+import uuid
+from contextlib import AsyncExitStack
 from typing import Dict, Any, AsyncGenerator, List
 from pydantic import BaseModel
 
+import orjson
 from psycopg_pool import AsyncConnectionPool
 import dspy
 
 from plan_execute.agent.models import ChatRequest
 from plan_execute.agent.dspy_checkpointer import DSPyConversationCheckpointer
+from plan_execute.agent.sse import (
+    CONTENT_FRAME_TMPL,
+    DONE_FRAME,
+    FINAL_FRAME_TMPL,
+    FLUSH_TICK,
+    ROLE_FRAME_TMPL,
+    aiter_with_flush_ticks,
+    content_frame_template as _content_frame_template,
+)
 from plan_execute.config import settings
 
 from dotenv import load_dotenv
@@ -22,11 +34,42 @@ load_dotenv()
 
 logger = logging.getLogger("dspy_service")
 
+_MODEL = b"claude4_sonnet"
+
 
 class DSPyChatResponse(BaseModel):
     response: str
 
 
+class MCPToolWrapper(dspy.Tool):
+    """DSPy tool wrapper around an async MCP tool function.
+
+    Defined at module scope so the class object is built once, not per
+    registered tool.
+    """
+
+    def __init__(self, name: str, description: str, func):
+        self.name = name
+        self.description = description
+        self.func = func
+
+    async def acall(self, **kwargs):
+        """Async call to MCP tool."""
+        logger.info(f"🛠️ Calling MCP tool: {self.name} with args: {kwargs}")
+        try:
+            result = await self.func(**kwargs)
+            logger.info(f"✅ MCP tool {self.name} completed successfully")
+            logger.debug(f"Tool result: {result}")
+            return result
+        except Exception as e:
+            logger.error(f"❌ MCP tool {self.name} failed: {e}")
+            raise
+
+    def __call__(self, **kwargs):
+        """Sync call - not supported for MCP tools."""
+        raise NotImplementedError("MCP tools only support async calls. Use acall() instead.")
+
+
 class ConversationSignature(dspy.Signature):
     """A conversational AI assistant with airline booking tools. Can help with flight searches, bookings, modifications, and general conversation."""
     history: dspy.History = dspy.InputField(desc="Previous conversation history")
@@ -42,7 +85,9 @@ class DSPyAgentService:
     """
 
     def __init__(self, pool: AsyncConnectionPool, mcp_server_path: str = None) -> None:
-        self.checkpointer = DSPyConversationCheckpointer(pool)
+        # Conversation persistence runs on its own asyncpg pool; the psycopg
+        # pool is kept only for the LangGraph-compatible services sharing it.
+        self.checkpointer = DSPyConversationCheckpointer()
         self.pool = pool
         
         # MCP server configuration - co-locate with this service
@@ -50,67 +95,49 @@ class DSPyAgentService:
         current_dir = os.path.dirname(os.path.abspath(__file__))
         self.mcp_server_path = mcp_server_path or os.path.join(current_dir, "mcp_server.py")
         self.mcp_tools = []
-        self.mcp_session = None  # Keep session alive for tool calls
+        # One long-lived server session shared by every tool call; the exit
+        # stack owns the subprocess and session lifetimes until aclose().
+        self._mcp_stack = AsyncExitStack()
+        self.mcp_session = None
         
-        # Configure DSPy with the same LLM settings as the original service
+        # LM configuration is applied per call via dspy.context rather
+        # than dspy.configure: no process-global mutation, so concurrent
+        # requests don't share (or contend on) global DSPy settings.
         self.lm = self._configure_dspy_lm()
-        dspy.configure(lm=self.lm)
         
         # These will be initialized with MCP tools in initialize()
         self.chat_predictor = None
         self.streaming_chat = None
 
+        # Background persistence tasks; kept referenced so the event loop
+        # can't garbage-collect them mid-flight.
+        self._pending_saves: set = set()
+
     def _configure_dspy_lm(self):
-        """Configure DSPy LM with the same settings as the original service."""
-        try:
-            # Try OpenAI-compatible configuration first
-            return dspy.LM(
-                model="openai/claude4_sonnet",
-                api_base=settings.openai_base_url,
-                api_key=settings.openai_api_key.get_secret_value(),
-            )
-        except Exception as e:
-            logger.warning(f"Failed to configure OpenAI-compatible LM: {e}")
-            try:
-                # Fallback to direct model name
-                return dspy.LM(
-                    model="claude4_sonnet",
-                    api_base=settings.openai_base_url,
-                    api_key=settings.openai_api_key.get_secret_value(),
-                )
-            except Exception as e2:
-                logger.error(f"Failed to configure DSPy LM: {e2}")
-                raise Exception(f"Could not configure DSPy LM: {e2}")
+        """Configure DSPy LM with the same settings as the original service.
+
+        Construction never touches the provider — bad prefixes or endpoints
+        only surface at the first call — so there is nothing useful to catch
+        here and a single direct build keeps cold start cheap.
+        """
+        return dspy.LM(
+            model="openai/claude4_sonnet",
+            api_base=settings.openai_base_url,
+            api_key=settings.openai_api_key.get_secret_value(),
+        )
 
     async def _create_mcp_tool_wrapper(self, tool_name: str, tool_description: str, tool_func):
         """Create a DSPy tool wrapper for MCP tools."""
-        
-        class MCPToolWrapper(dspy.Tool):
-            def __init__(self, name: str, description: str, func):
-                self.name = name
-                self.description = description
-                self.func = func
-                
-            async def acall(self, **kwargs):
-                """Async call to MCP tool."""
-                logger.info(f"🛠️ Calling MCP tool: {self.name} with args: {kwargs}")
-                try:
-                    result = await self.func(**kwargs)
-                    logger.info(f"✅ MCP tool {self.name} completed successfully")
-                    logger.debug(f"Tool result: {result}")
-                    return result
-                except Exception as e:
-                    logger.error(f"❌ MCP tool {self.name} failed: {e}")
-                    raise
-                    
-            def __call__(self, **kwargs):
-                """Sync call - not supported for MCP tools."""
-                raise NotImplementedError("MCP tools only support async calls. Use acall() instead.")
-        
         return MCPToolWrapper(tool_name, tool_description, tool_func)
 
     async def _initialize_mcp_tools(self) -> List[dspy.Tool]:
-        """Initialize MCP tools by connecting to the MCP server."""
+        """Initialize MCP tools over a single long-lived server session.
+
+        The stdio_client subprocess and ClientSession are entered on
+        self._mcp_stack and stay open for the life of the service, so tool
+        calls from the ReAct loop reuse one session instead of re-spawning
+        the server per call. list_tools therefore also runs exactly once.
+        """
         logger.info(f"🔧 Initializing MCP tools from server: {self.mcp_server_path}")
         
         try:
@@ -123,49 +150,46 @@ class DSPyAgentService:
                 logger.warning(f"⚠️ MCP server file not found: {self.mcp_server_path}")
                 return []
             
-            # Create persistent connection parameters
-            self.mcp_server_params = StdioServerParameters(
+            server_params = StdioServerParameters(
                 command="python",
                 args=[self.mcp_server_path],
                 env=None,
             )
             
-            logger.info("🚀 Testing MCP server connection...")
-            async with stdio_client(self.mcp_server_params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    # Initialize the connection
-                    logger.info("🤝 Initializing MCP session...")
-                    await session.initialize()
-                    
-                    # List available tools
-                    logger.info("📋 Listing available MCP tools...")
-                    tools = await session.list_tools()
-                    
-                    # Create tool wrappers that can create their own sessions
-                    dspy_tools = []
-                    for tool in tools.tools:
-                        logger.info(f"🛠️ Creating wrapper for MCP tool: {tool.name} - {tool.description}")
-                        
-                        # Create a closure that captures the tool info
-                        async def create_tool_func(tool_name=tool.name):
-                            async def tool_func(**kwargs):
-                                # Create a new session for each tool call
-                                async with stdio_client(self.mcp_server_params) as (read, write):
-                                    async with ClientSession(read, write) as session:
-                                        await session.initialize()
-                                        result = await session.call_tool(tool_name, kwargs)
-                                        return result.content
-                            return tool_func
-                        
-                        tool_func = await create_tool_func(tool.name)
-                        tool_wrapper = await self._create_mcp_tool_wrapper(tool.name, tool.description, tool_func)
-                        dspy_tools.append(tool_wrapper)
-                    
-                    logger.info(f"✅ Successfully initialized {len(dspy_tools)} MCP tools")
-                    for tool in dspy_tools:
-                        logger.info(f"  • {tool.name}: {tool.description}")
-                    
-                    return dspy_tools
+            logger.info("🚀 Starting persistent MCP server session...")
+            read, write = await self._mcp_stack.enter_async_context(
+                stdio_client(server_params)
+            )
+            self.mcp_session = await self._mcp_stack.enter_async_context(
+                ClientSession(read, write)
+            )
+            logger.info("🤝 Initializing MCP session...")
+            await self.mcp_session.initialize()
+            
+            # List available tools (once; the session stays alive)
+            logger.info("📋 Listing available MCP tools...")
+            tools = await self.mcp_session.list_tools()
+            
+            dspy_tools = []
+            for tool in tools.tools:
+                logger.info(f"🛠️ Creating wrapper for MCP tool: {tool.name} - {tool.description}")
+                
+                # Each wrapper calls straight into the shared session
+                async def create_tool_func(tool_name=tool.name):
+                    async def tool_func(**kwargs):
+                        result = await self.mcp_session.call_tool(tool_name, kwargs)
+                        return result.content
+                    return tool_func
+                
+                tool_func = await create_tool_func(tool.name)
+                tool_wrapper = await self._create_mcp_tool_wrapper(tool.name, tool.description, tool_func)
+                dspy_tools.append(tool_wrapper)
+            
+            logger.info(f"✅ Successfully initialized {len(dspy_tools)} MCP tools")
+            for tool in dspy_tools:
+                logger.info(f"  • {tool.name}: {tool.description}")
+            
+            return dspy_tools
                     
         except ImportError as e:
             logger.warning(f"📦 MCP packages not available: {e} - continuing without tools")
@@ -173,6 +197,8 @@ class DSPyAgentService:
         except Exception as e:
             logger.error(f"❌ Failed to initialize MCP tools: {e} - continuing without tools")
             logger.debug("Full MCP initialization error:", exc_info=True)
+            await self._mcp_stack.aclose()
+            self.mcp_session = None
             return []
 
     async def initialize(self) -> None:
@@ -207,23 +233,123 @@ class DSPyAgentService:
             logger.error(f"Error initializing DSPy service: {e}")
             raise e
 
-    async def chat_stream(self, req: ChatRequest) -> AsyncGenerator[str, None]:
+    async def aclose(self) -> None:
+        """Drain in-flight saves and tear down the persistent MCP session.
+
+        Call once at shutdown. Fire-and-forget persistence means a save may
+        still be running when the lifespan exits; waiting here keeps the
+        last turn from being lost to a process exit. The checkpointer owns
+        its asyncpg pool and keep-alive task, so it closes last — after the
+        drained saves no longer need it.
+        """
+        if self._pending_saves:
+            await asyncio.gather(*self._pending_saves, return_exceptions=True)
+        await self._mcp_stack.aclose()
+        self.mcp_session = None
+        await self.checkpointer.aclose()
+
+    async def chat_stream(self, req: ChatRequest) -> AsyncGenerator[bytes, None]:
+        """
+        Stream chat responses, coalescing small SSE events into batches.
+
+        Every async yield is an extra Task/Future hop in asyncio, which
+        dominates CPU at high token rates. Buffer events until either
+        settings.stream_batch_n events have accumulated or
+        settings.stream_batch_ms has elapsed, then yield them joined.
+        Consumers split on the SSE frame delimiter so batching is
+        transparent.
+
+        A producer task drains the LM stream into a bounded queue so a
+        slow HTTP client stalls the queue, not the model: generation (and
+        the provider connection behind it) finishes at its own pace while
+        the network catches up. The bound keeps a fully-stalled client
+        from buffering the whole response in memory.
+
+        :param req: validated request model
+        :yields: batches of SSE events as they're generated
+        """
+        inner = self._chat_stream(req)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+
+        async def _produce():
+            # Cancellation must propagate (teardown below relies on it);
+            # only real stream failures are handed to the consumer.
+            try:
+                async for event in inner:
+                    await queue.put(event)
+                await queue.put(None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                await queue.put(exc)
+
+        producer = asyncio.create_task(_produce())
+        buf = []
+        batch_s = settings.stream_batch_ms / 1000.0
+        deadline = 0.0
+        try:
+            while True:
+                if buf:
+                    # A partial batch is aging: wait only until its
+                    # deadline, then flush what we have. Waiting on the
+                    # queue without a timeout would hold already-generated
+                    # frames for the entire length of an LM stall.
+                    try:
+                        event = await asyncio.wait_for(
+                            queue.get(), deadline - time.monotonic()
+                        )
+                    except asyncio.TimeoutError:
+                        yield b"".join(buf)
+                        buf.clear()
+                        continue
+                else:
+                    event = await queue.get()
+                if event is None:
+                    break
+                if isinstance(event, BaseException):
+                    raise event
+                buf.append(event)
+                if len(buf) == 1:
+                    deadline = time.monotonic() + batch_s
+                if len(buf) >= settings.stream_batch_n:
+                    yield b"".join(buf)
+                    buf.clear()
+            if buf:
+                yield b"".join(buf)
+        finally:
+            # Client disconnects land here; stop the producer and close
+            # the inner generator so nothing leaks. The cancelled task
+            # must be awaited first — aclose() on a generator the
+            # producer is still suspended in raises "already running".
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
+            await inner.aclose()
+
+    async def _chat_stream(self, req: ChatRequest) -> AsyncGenerator[bytes, None]:
         """
         Stream chat responses back to the client with proper state persistence.
-        
+
         :param req: validated request model
         :yields: chunks of the response as they're generated
         """
         logger.info("🚀 Processing DSPy streaming chat for thread_id=%s message=%r", req.thread_id, req.message)
-        
+
+        # Resolve the debug gate once; the token loop below runs per chunk
+        # and shouldn't pay even a level check + format per token.
+        _debug = logger.isEnabledFor(logging.DEBUG)
+
         # Log tool availability
-        if self.mcp_tools:
-            logger.info(f"🛠️ Tools available for this request: {len(self.mcp_tools)} MCP tools")
-        else:
-            logger.info("💬 No tools available - using basic conversation mode")
+        if _debug:
+            if self.mcp_tools:
+                logger.debug(f"🛠️ Tools available for this request: {len(self.mcp_tools)} MCP tools")
+            else:
+                logger.debug("💬 No tools available - using basic conversation mode")
         
         # Validate message
-        if not req.message or not req.message.strip():
+        if not req.message or req.message.isspace():
             logger.warning("Empty message received, providing default response")
             error_response = "I didn't receive a message. Please type something and try again."
             
@@ -233,196 +359,179 @@ class DSPyAgentService:
             return
         
         try:
-            # Load conversation history from PostgreSQL
-            history = await self.checkpointer.load_conversation(req.thread_id)
+            # Load conversation history (memory within the TTL window,
+            # PostgreSQL otherwise)
+            history = await self.checkpointer.load_cached(req.thread_id)
             
-            logger.info(f"Thread ID: {req.thread_id}")
-            logger.info(f"Retrieved {len(history.messages) if history.messages else 0} existing messages from DSPy checkpointer")
+            if _debug:
+                logger.debug(f"Retrieved {len(history.messages) if history.messages else 0} existing messages from DSPy checkpointer")
             
-            # Use DSPy streaming to generate response
-            chunk_id = f"chatcmpl-{int(time.time())}"
-            
-            # Send initial chunk
-            initial_chunk = {
-                "id": chunk_id,
-                "object": "chat.completion.chunk",
-                "created": int(time.time()),
-                "model": "claude4_sonnet",
-                "choices": [{
-                    "index": 0,
-                    "delta": {"role": "assistant", "content": ""},
-                    "finish_reason": None
-                }]
-            }
-            yield f"data: {json.dumps(initial_chunk)}\n\n"
+            # Use DSPy streaming to generate response. One timestamp per
+            # turn: every chunk of the stream carries the same created,
+            # which also keeps the frames byte-stable for clients that
+            # diff or cache them.
+            created = int(time.time())
+            # uuid keeps ids unique across concurrent streams (epoch-second
+            # ids collide for any two streams started in the same second)
+            chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            cid = chunk_id.encode()
+            frame_head, frame_tail = _content_frame_template(chunk_id, created, "claude4_sonnet")
+
+            # Send initial chunk (pre-baked template; no dict build)
+            yield ROLE_FRAME_TMPL % (cid, created, _MODEL)
             
-            # Stream the DSPy response
+            # Stream the DSPy response. Token deltas are coalesced: tokens
+            # collect in `pending` and go out as one merged frame once
+            # stream_coalesce_bytes or stream_coalesce_ms accumulate, so a
+            # fast model doesn't produce one frame per token.
             full_response = ""
+            # Every delta also lands in parts, so the full text can be
+            # reconstructed without the final Prediction if the stream is
+            # cut short before it arrives.
+            parts = []
+            pending = []
+            pending_len = 0
+            last_flush = time.monotonic()
+            coalesce_bytes = settings.stream_coalesce_bytes
+            coalesce_s = settings.stream_coalesce_ms / 1000.0
             
-            # Call the streaming predictor (ReAct or Predict depending on tools)
-            if self.mcp_tools:
-                logger.info("🤖 Using ReAct agent with MCP tools for streaming response")
-                # Use ReAct with tools - need to use acall for async tools
-                stream_generator = self.streaming_chat(
-                    history=history,
-                    user_message=req.message
-                )
-            else:
-                logger.info("💬 Using basic Predict for streaming response")
-                # Use basic Predict
-                stream_generator = self.streaming_chat(
-                    history=history,
-                    user_message=req.message
-                )
-            
-            async for chunk in stream_generator:
-                if isinstance(chunk, dspy.Prediction):
-                    # This is the final prediction - extract the response
-                    final_prediction = chunk
-                    # Handle both ReAct (with process_result) and Predict (with response) outputs
-                    if hasattr(chunk, 'process_result'):
-                        full_response = chunk.process_result
-                        logger.info(f"✅ Final DSPy ReAct prediction completed")
-                        logger.debug(f"ReAct response: {chunk.process_result}")
-                        
-                        # Log tool usage if available in trajectory
-                        if hasattr(chunk, 'trajectory') and chunk.trajectory:
-                            tool_calls = [k for k in chunk.trajectory.keys() if k.startswith('tool_name_')]
-                            if tool_calls:
-                                used_tools = [chunk.trajectory[k] for k in tool_calls]
-                                logger.info(f"🛠️ Tools used in this conversation: {', '.join(used_tools)}")
-                    else:
-                        full_response = chunk.response
-                        logger.info(f"✅ Final DSPy Predict response completed")
-                        logger.debug(f"Predict response: {chunk.response}")
-                elif hasattr(chunk, 'choices') and chunk.choices:
-                    # This is a ModelResponseStream from LiteLLM - extract content
-                    delta = chunk.choices[0].delta
-                    if hasattr(delta, 'content') and delta.content:
-                        content = delta.content
-                        logger.debug(f"DSPy streaming chunk: {repr(content)}")
-                        
-                        # Convert to OpenAI-compatible streaming format
-                        streaming_chunk = {
-                            "id": chunk_id,
-                            "object": "chat.completion.chunk",
-                            "created": int(time.time()),
-                            "model": "claude4_sonnet",
-                            "choices": [{
-                                "index": 0,
-                                "delta": {"content": content},
-                                "finish_reason": None
-                            }]
-                        }
-                        yield f"data: {json.dumps(streaming_chunk)}\n\n"
-                elif isinstance(chunk, dspy.streaming.StreamResponse):
-                    # This is a DSPy StreamResponse from listeners
-                    if hasattr(chunk, 'content') and chunk.content:
-                        content = chunk.content
-                        logger.debug(f"DSPy stream response: {repr(content)}")
-                        
-                        # Convert to OpenAI-compatible streaming format
-                        streaming_chunk = {
-                            "id": chunk_id,
-                            "object": "chat.completion.chunk",
-                            "created": int(time.time()),
-                            "model": "claude4_sonnet",
-                            "choices": [{
-                                "index": 0,
-                                "delta": {"content": content},
-                                "finish_reason": None
-                            }]
-                        }
-                        yield f"data: {json.dumps(streaming_chunk)}\n\n"
+            # The LM is scoped to this request; dspy.context is
+            # contextvar-based, so it stays in effect for the whole
+            # consumption of the stream without touching global state.
+            with dspy.context(lm=self.lm):
+                # Call the streaming predictor (ReAct or Predict depending on tools)
+                if self.mcp_tools:
+                    logger.info("🤖 Using ReAct agent with MCP tools for streaming response")
+                    # Use ReAct with tools - need to use acall for async tools
+                    stream_generator = self.streaming_chat(
+                        history=history,
+                        user_message=req.message
+                    )
                 else:
-                    # Handle other chunk types (status messages, etc.)
-                    logger.debug(f"Other DSPy chunk type: {type(chunk)} - {repr(chunk)}")
-                    # Skip status messages to match original behavior
+                    logger.info("💬 Using basic Predict for streaming response")
+                    # Use basic Predict
+                    stream_generator = self.streaming_chat(
+                        history=history,
+                        user_message=req.message
+                    )
             
-            # Send final chunk
-            final_chunk = {
-                "id": chunk_id,
-                "object": "chat.completion.chunk",
-                "created": int(time.time()),
-                "model": "claude4_sonnet",
-                "choices": [{
-                    "index": 0,
-                    "delta": {},
-                    "finish_reason": "stop"
-                }]
-            }
-            yield f"data: {json.dumps(final_chunk)}\n\n"
+                # The tick wrapper turns the ms threshold into a real
+                # timer: when the LM stream stalls (tool calls), buffered
+                # deltas go out within the window instead of sitting for
+                # the whole pause.
+                async for chunk in aiter_with_flush_ticks(stream_generator, coalesce_s):
+                    if chunk is FLUSH_TICK:
+                        if pending:
+                            yield frame_head + orjson.dumps("".join(pending)) + frame_tail
+                            pending.clear()
+                            pending_len = 0
+                            last_flush = time.monotonic()
+                        continue
+                    if isinstance(chunk, dspy.Prediction):
+                        # This is the final prediction - extract the response
+                        final_prediction = chunk
+                        # Handle both ReAct (with process_result) and Predict (with response) outputs
+                        process_result = getattr(chunk, 'process_result', None)
+                        if process_result is not None:
+                            full_response = process_result
+                            logger.info(f"✅ Final DSPy ReAct prediction completed")
+                            logger.debug(f"ReAct response: {process_result}")
+
+                            # Log tool usage if available in trajectory —
+                            # the scan only exists for this log line, so
+                            # skip it outright when INFO is off.
+                            trajectory = getattr(chunk, 'trajectory', None)
+                            if trajectory and logger.isEnabledFor(logging.INFO):
+                                used_tools = [v for k, v in trajectory.items() if k.startswith('tool_name_')]
+                                if used_tools:
+                                    logger.info(f"🛠️ Tools used in this conversation: {', '.join(used_tools)}")
+                        else:
+                            full_response = chunk.response
+                            logger.info(f"✅ Final DSPy Predict response completed")
+                            logger.debug(f"Predict response: {chunk.response}")
+                    else:
+                        # ModelResponseStream from LiteLLM is the only other
+                        # chunk type that carries text (streamify runs with no
+                        # listeners). One getattr probe each for the choices
+                        # list and the delta text; empty/tool-call-only deltas
+                        # skip all frame work.
+                        choices = getattr(chunk, 'choices', None)
+                        if not choices:
+                            # Other chunk types (status messages, etc.)
+                            if _debug:
+                                logger.debug(f"Other DSPy chunk type: {type(chunk)} - {repr(chunk)}")
+                            continue
+                        content = getattr(choices[0].delta, 'content', None)
+                        if not content:
+                            continue
+                        if _debug:
+                            logger.debug(f"DSPy streaming chunk: {repr(content)}")
+
+                        parts.append(content)
+                        pending.append(content)
+                        pending_len += len(content)
+                        if pending_len >= coalesce_bytes or time.monotonic() - last_flush >= coalesce_s:
+                            yield frame_head + orjson.dumps("".join(pending)) + frame_tail
+                            pending.clear()
+                            pending_len = 0
+                            last_flush = time.monotonic()
             
-            # Update conversation history with the new exchange
-            try:
-                # Add the new user message and assistant response to history
-                updated_messages = history.messages.copy() if history.messages else []
-                updated_messages.append({
-                    "user_message": req.message,
-                    "response": full_response
-                })
-                
-                # Create updated history and save to PostgreSQL
-                updated_history = dspy.History(messages=updated_messages)
-                await self.checkpointer.save_conversation(req.thread_id, updated_history)
-                
-                logger.info(f"Successfully saved conversation state with {len(updated_messages)} messages")
-                
-            except Exception as e:
-                logger.error(f"Failed to save conversation state: {e}", exc_info=True)
-                # Continue anyway - the conversation still worked for this turn
+                # Flush any tail of the coalescing buffer before closing out
+                if pending:
+                    yield frame_head + orjson.dumps("".join(pending)) + frame_tail
+                    pending.clear()
+
+                # Send final chunk (pre-baked template; no dict build)
+                yield FINAL_FRAME_TMPL % (cid, created, _MODEL)
             
+            # If the final Prediction never arrived, persist the joined
+            # deltas rather than dropping the turn. (With ReAct the raw
+            # deltas include reasoning/tool chatter, so the Prediction's
+            # process_result stays authoritative when present.)
+            if not full_response and parts:
+                full_response = "".join(parts)
+
+            # Persist the new turn in the background: the append-only insert
+            # doesn't need to block the final chunks reaching the client.
+            # An empty response means the model produced nothing worth
+            # replaying into history, so skip the write entirely.
+            if full_response:
+                save_task = asyncio.create_task(
+                    self.checkpointer.append_message(req.thread_id, {
+                        "user_message": req.message,
+                        "response": full_response
+                    })
+                )
+                self._pending_saves.add(save_task)
+                save_task.add_done_callback(self._on_save_done)
+
             # Signal completion
-            yield "data: [DONE]\n\n"
+            yield DONE_FRAME
                     
         except Exception as exc:
             logger.exception("DSPy streaming chat execution failed")
             async for chunk in self._stream_error_response(f"Error: {str(exc)}"):
                 yield chunk
 
-    async def _stream_error_response(self, error_message: str) -> AsyncGenerator[str, None]:
-        """Stream an error response in OpenAI-compatible format."""
-        chunk_id = f"chatcmpl-{int(time.time())}"
-        
-        initial_chunk = {
-            "id": chunk_id,
-            "object": "chat.completion.chunk",
-            "created": int(time.time()),
-            "model": "claude4_sonnet",
-            "choices": [{
-                "index": 0,
-                "delta": {"role": "assistant", "content": ""},
-                "finish_reason": None
-            }]
-        }
-        yield f"data: {json.dumps(initial_chunk)}\n\n"
-        
-        content_chunk = {
-            "id": chunk_id,
-            "object": "chat.completion.chunk",
-            "created": int(time.time()),
-            "model": "claude4_sonnet",
-            "choices": [{
-                "index": 0,
-                "delta": {"content": error_message},
-                "finish_reason": None
-            }]
-        }
-        yield f"data: {json.dumps(content_chunk)}\n\n"
-        
-        final_chunk = {
-            "id": chunk_id,
-            "object": "chat.completion.chunk",
-            "created": int(time.time()),
-            "model": "claude4_sonnet",
-            "choices": [{
-                "index": 0,
-                "delta": {},
-                "finish_reason": "stop"
-            }]
-        }
-        yield f"data: {json.dumps(final_chunk)}\n\n"
-        yield "data: [DONE]\n\n"
+    def _on_save_done(self, task: asyncio.Task) -> None:
+        """Drop the task reference and surface background save failures."""
+        self._pending_saves.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Failed to save conversation state: {task.exception()}")
+
+    async def _stream_error_response(self, error_message: str) -> AsyncGenerator[bytes, None]:
+        """Stream an error response in OpenAI-compatible format.
+
+        The frames are %-formatted byte templates; only the error text
+        itself goes through a JSON string encode.
+        """
+        created = int(time.time())
+        cid = b"chatcmpl-" + uuid.uuid4().hex[:12].encode()
+
+        yield ROLE_FRAME_TMPL % (cid, created, _MODEL)
+        yield CONTENT_FRAME_TMPL % (cid, created, _MODEL, orjson.dumps(error_message))
+        yield FINAL_FRAME_TMPL % (cid, created, _MODEL)
+        yield DONE_FRAME
 
     async def chat(self, req: ChatRequest) -> DSPyChatResponse:
         """
@@ -434,41 +543,39 @@ class DSPyAgentService:
         logger.info("Processing DSPy chat for thread_id=%s message=%r", req.thread_id, req.message)
         
         # Validate message
-        if not req.message or not req.message.strip():
+        if not req.message or req.message.isspace():
             logger.warning("Empty message received, providing default response")
             return DSPyChatResponse(response="I didn't receive a message. Please type something and try again.")
         
         try:
             # Load conversation history
-            history = await self.checkpointer.load_conversation(req.thread_id)
+            history = await self.checkpointer.load_cached(req.thread_id)
             
-            # Generate response using DSPy (ReAct or Predict depending on tools)
-            if self.mcp_tools:
-                # Use ReAct with tools - need async call for tools
-                prediction = await self.chat_predictor.acall(
-                    history=history,
-                    user_message=req.message
-                )
-                # ReAct uses process_result
-                response_text = prediction.process_result if hasattr(prediction, 'process_result') else prediction.response
-            else:
-                # Use basic Predict
-                prediction = self.chat_predictor(
-                    history=history,
-                    user_message=req.message
-                )
-                response_text = prediction.response
+            # Generate response using DSPy (ReAct or Predict depending on
+            # tools); the LM is scoped to this call via dspy.context
+            with dspy.context(lm=self.lm):
+                if self.mcp_tools:
+                    # Use ReAct with tools - need async call for tools
+                    prediction = await self.chat_predictor.acall(
+                        history=history,
+                        user_message=req.message
+                    )
+                    # ReAct uses process_result
+                    response_text = getattr(prediction, 'process_result', None) or prediction.response
+                else:
+                    # Use basic Predict
+                    prediction = self.chat_predictor(
+                        history=history,
+                        user_message=req.message
+                    )
+                    response_text = prediction.response
             
-            # Update conversation history
-            updated_messages = history.messages.copy() if history.messages else []
-            updated_messages.append({
+            # Persist only the new turn (append-only history)
+            await self.checkpointer.append_message(req.thread_id, {
                 "user_message": req.message,
                 "response": response_text
             })
-            
-            updated_history = dspy.History(messages=updated_messages)
-            await self.checkpointer.save_conversation(req.thread_id, updated_history)
-            
+
             return DSPyChatResponse(response=response_text)
             
         except Exception as exc:
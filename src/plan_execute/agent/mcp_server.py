@@ -1,9 +1,11 @@
-import random
-import string
 import logging
+import os
+import secrets
+import sqlite3
+from collections import defaultdict
 
 from mcp.server.fastmcp import FastMCP
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 # Configure logging for the MCP server
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +17,8 @@ mcp = FastMCP("Airline Agent")
 
 class Date(BaseModel):
     # Somehow LLM is bad at specifying `datetime.datetime`
+    model_config = ConfigDict(frozen=True)
+
     year: int
     month: int
     day: int
@@ -22,12 +26,16 @@ class Date(BaseModel):
 
 
 class UserProfile(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     user_id: str
     name: str
     email: str
 
 
 class Flight(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     flight_id: str
     date_time: Date
     origin: str
@@ -37,12 +45,15 @@ class Flight(BaseModel):
 
 
 class Itinerary(BaseModel):
+    # Deliberately not frozen: modify_itinerary swaps .flight in place.
     confirmation_number: str
     user_profile: UserProfile
     flight: Flight
 
 
 class Ticket(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     user_request: str
     user_profile: UserProfile
 
@@ -146,25 +157,57 @@ flight_database = {
     ),
 }
 
-itinerary_database = {}  # Will be populated as bookings are made
+# Itineraries live in SQLite rather than a per-process dict: bookings
+# survive restarts and every MCP server process shares the same state.
+# WAL mode lets concurrent workers read while one writes; reads come off
+# mmap'd pages instead of being rebuilt per process. The sqlite3 module
+# serializes access internally, so the shared connection is safe from
+# FastMCP's worker threads.
+_DB_PATH = os.environ.get(
+    "AIRLINE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "airline.db"),
+)
+_db = sqlite3.connect(_DB_PATH, isolation_level=None, check_same_thread=False)
+_db.execute("PRAGMA journal_mode=WAL")
+_db.execute("PRAGMA synchronous=NORMAL")
+_db.execute(
+    "CREATE TABLE IF NOT EXISTS itineraries (confirmation TEXT PRIMARY KEY, payload TEXT NOT NULL)"
+)
+
+
+def _load_itinerary(confirmation_number: str):
+    row = _db.execute(
+        "SELECT payload FROM itineraries WHERE confirmation = ?",
+        (confirmation_number,),
+    ).fetchone()
+    return Itinerary.model_validate_json(row[0]) if row else None
+
+# Index flights by (origin, destination, year, month, day) once at module
+# load so fetch_flight_info is a hash lookup instead of a full scan.
+# Bookings/modifications never mutate flight_database, so no rebuild needed.
+_flight_index = defaultdict(list)
+for _flight in flight_database.values():
+    _flight_index[
+        (_flight.origin, _flight.destination, _flight.date_time.year, _flight.date_time.month, _flight.date_time.day)
+    ].append(_flight)
+
+# Pre-serialized forms of the static records: FastMCP re-serializes whatever
+# a tool returns on every call, so returning these ready-made dicts skips
+# the per-call pydantic model_dump for data that never changes.
+_user_info_cache = {name: profile.model_dump() for name, profile in user_database.items()}
+_flight_info_cache = {key: [f.model_dump() for f in flights] for key, flights in _flight_index.items()}
 
 
 @mcp.tool()
 def fetch_flight_info(date: Date, origin: str, destination: str):
     """Fetch flight information from origin to destination on the given date"""
     logger.info(f"🔍 Searching flights: {origin} → {destination} on {date.year}-{date.month:02d}-{date.day:02d}")
-    
-    flights = []
-    for flight_id, flight in flight_database.items():
-        if (
-            flight.date_time.year == date.year
-            and flight.date_time.month == date.month
-            and flight.date_time.day == date.day
-            and flight.origin == origin
-            and flight.destination == destination
-        ):
-            flights.append(flight)
-    
+
+    # Index keys are uppercase IATA codes; normalize so "sfo" from the
+    # LLM still hits instead of silently returning no flights.
+    key = (origin.strip().upper(), destination.strip().upper(), date.year, date.month, date.day)
+    flights = _flight_info_cache.get(key, [])
+
     logger.info(f"✈️ Found {len(flights)} flights matching criteria")
     return flights
 
@@ -174,8 +217,8 @@ def fetch_itinerary(confirmation_number: str):
     """Fetch itinerary information using confirmation number"""
     logger.info(f"🎫 Looking up itinerary: {confirmation_number}")
     
-    if confirmation_number in itinerary_database:
-        itinerary = itinerary_database[confirmation_number]
+    itinerary = _load_itinerary(confirmation_number)
+    if itinerary is not None:
         logger.info(f"✅ Found itinerary for {itinerary.user_profile.name}")
         return itinerary
     else:
@@ -200,7 +243,7 @@ def book_itinerary(user_name: str, flight_id: str):
     flight = flight_database[flight_id]
 
     # Generate confirmation number
-    confirmation_number = "".join(random.choices(string.ascii_lowercase + string.digits, k=8))
+    confirmation_number = secrets.token_hex(4)
 
     # Create itinerary
     itinerary = Itinerary(
@@ -210,8 +253,12 @@ def book_itinerary(user_name: str, flight_id: str):
     )
 
     # Store in database
-    itinerary_database[confirmation_number] = itinerary
-    
+    _db.execute(
+        "INSERT INTO itineraries (confirmation, payload) VALUES (?, ?)",
+        (confirmation_number, itinerary.model_dump_json()),
+    )
+
+
     logger.info(f"✅ Successfully booked flight {flight_id} for {user_name}, confirmation: {confirmation_number}")
     return itinerary
 
@@ -221,14 +268,15 @@ def modify_itinerary(confirmation_number: str, new_flight_id: str = None, cancel
     """Modify an existing itinerary - either change flight or cancel"""
     logger.info(f"✏️ Modifying itinerary {confirmation_number}, cancel={cancel}, new_flight={new_flight_id}")
     
-    if confirmation_number not in itinerary_database:
+    itinerary = _load_itinerary(confirmation_number)
+    if itinerary is None:
         logger.error(f"❌ Confirmation number not found: {confirmation_number}")
         return f"Confirmation number {confirmation_number} not found"
 
     if cancel:
         # Cancel the booking
-        cancelled_itinerary = itinerary_database.pop(confirmation_number)
-        logger.info(f"🗑️ Cancelled booking {confirmation_number} for {cancelled_itinerary.user_profile.name}")
+        _db.execute("DELETE FROM itineraries WHERE confirmation = ?", (confirmation_number,))
+        logger.info(f"🗑️ Cancelled booking {confirmation_number} for {itinerary.user_profile.name}")
         return f"Booking {confirmation_number} has been cancelled"
 
     if new_flight_id:
@@ -237,9 +285,12 @@ def modify_itinerary(confirmation_number: str, new_flight_id: str = None, cancel
             return f"Flight {new_flight_id} not found"
 
         # Update the flight
-        itinerary = itinerary_database[confirmation_number]
         old_flight = itinerary.flight.flight_id
         itinerary.flight = flight_database[new_flight_id]
+        _db.execute(
+            "UPDATE itineraries SET payload = ? WHERE confirmation = ?",
+            (itinerary.model_dump_json(), confirmation_number),
+        )
         logger.info(f"🔄 Updated itinerary {confirmation_number}: {old_flight} → {new_flight_id}")
         return itinerary
 
@@ -255,7 +306,7 @@ def get_user_info(user_name: str):
     if user_name in user_database:
         user = user_database[user_name]
         logger.info(f"✅ Found user: {user.name} ({user.email})")
-        return user
+        return _user_info_cache[user_name]
     else:
         logger.warning(f"❌ User not found: {user_name}")
         return f"User {user_name} not found"
@@ -271,10 +322,10 @@ def file_ticket(user_name: str, user_request: str):
         return f"User {user_name} not found in database"
 
     user_profile = user_database[user_name]
-    ticket = Ticket(user_request=user_request, user_profile=user_profile)
 
-    # In a real system, this would be stored in a ticketing system
-    ticket_id = "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    # In a real system a Ticket record would be stored in a ticketing
+    # system; nothing here reads one, so don't pay the model build.
+    ticket_id = secrets.token_hex(3).upper()
     
     logger.info(f"✅ Created support ticket {ticket_id} for {user_name}")
     return f"Support ticket {ticket_id} has been created for {user_name}. A human agent will contact you at {user_profile.email} within 24 hours."
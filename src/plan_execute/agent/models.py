@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 import operator
 from typing import Annotated, List, Tuple, Union, Literal
 from typing_extensions import TypedDict
@@ -13,13 +13,20 @@ class PlanExecute(TypedDict):
 
 class Plan(BaseModel):
     """Plan to follow in future"""
+    model_config = ConfigDict(frozen=True)
 
+    # Tag for cheap dispatch in replan_step (a string compare instead of
+    # isinstance); defaulted so the variant still parses if the LLM omits it.
+    kind: Literal["plan"] = "plan"
     steps: List[str] = Field(
         description="different steps to follow, should be in sorted order"
     )
 
 class Response(BaseModel):
     """Response to user."""
+    model_config = ConfigDict(frozen=True)
+
+    kind: Literal["response"] = "response"
     response: str = Field(
         description="The final response to the user's query."
         "Only use when you have the answer.",
@@ -28,6 +35,8 @@ class Response(BaseModel):
 
 class Act(BaseModel):
     """Action to perform."""
+    model_config = ConfigDict(frozen=True)
+
     reasoning: str = Field(
         description="Extremely brief reasoning of 15-20 words on whether the action needs to be a new Plan or a final Response"
     )
@@ -1,3 +1,7 @@
+import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
 
 from langchain_community.tools.searx_search.tool import SearxSearchResults
 from langchain_community.utilities import SearxSearchWrapper
@@ -8,11 +12,13 @@ from langgraph.graph import END
 from langgraph.types import Command
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 
-from plan_execute.agent.models import Plan, PlanExecute, Response, Act
+from plan_execute.agent.models import Plan, PlanExecute, Act
 
 # from phoenix.otel import register
 from plan_execute.config import settings
 from langfuse.langchain import CallbackHandler
+from langchain_core.globals import set_llm_cache
+from langchain_core.caches import InMemoryCache
 from dotenv import load_dotenv
 
 # DO THIS BEFORE TRYING TO SET UP TRACER_PROVIDER
@@ -24,56 +30,137 @@ from dotenv import load_dotenv
 #   protocol="http/protobuf",
 # )
 
-def get_planner(llm):
-    planner_prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                """For the given objective, come up with a simple step by step plan. \
+# Exact-match LLM response cache shared by the planner, replanner and the
+# react agent. Repeated objectives (demo scenarios, retried threads) hit the
+# cache and skip the provider round-trip entirely.
+set_llm_cache(InMemoryCache(maxsize=4096))
+
+# Prompt templates are compiled once at import; get_planner/get_replanner
+# only bind them to an llm. The structured-output binding (pydantic JSON
+# schema generation + tool binding) likewise happens once per process via
+# the module-level planner/replanner singletons below, never per call.
+_PLANNER_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """For the given objective, come up with a simple step by step plan. \
     This plan should involve individual tasks, that if executed correctly will yield the correct answer. Do not add any superfluous steps. \
     The result of the final step should be the final answer. Make sure that each step has all the information needed - do not skip steps.""",
-            ),
-            ("placeholder", "{messages}"),
-        ]
-    )
-    planner = planner_prompt | llm.with_structured_output(Plan)
-    return planner
+        ),
+        ("placeholder", "{messages}"),
+    ]
+)
 
 
+def get_planner(llm):
+    planner = _PLANNER_PROMPT | llm.with_structured_output(Plan)
+    return planner
+
 
-def get_replanner(llm):
 
-    replanner_prompt = ChatPromptTemplate.from_template(
-    """For the given objective, come up with a simple step by step plan. \
+# Prefix-stable layout: the system message carries the fixed
+# instructions plus the objective and original plan (which do not change
+# across replan loops within a thread); only the completed steps vary,
+# and they live in the trailing human message. Provider-side prompt
+# caching can therefore reuse the stable prefix on every replan after
+# the first.
+_REPLANNER_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """For the given objective, come up with a simple step by step plan. \
 This plan should involve individual tasks, that if executed correctly will yield the correct answer. Do not add any superfluous steps. \
 The result of the final step should be the final answer. Make sure that each step has all the information needed - do not skip steps.
 
+Update your plan accordingly. If no more steps are needed and you can return to the user, then respond with that. Otherwise, fill out the plan. Only add steps to the plan that still NEED to be done. Do not return previously done steps as part of the plan.
+When you are done return with a Response action, not a Plan action please. If there are still plan items unaccounted for, proceed with a Plan action.
+Reason extremely briefly in reasoning. Seriously just think like 10-20 words and that's it. It's only there so you don't say Response action and then want to list a plan.
+If it's a plan, use Plan aka action.steps . Unless the user is asking for a plan then you'll just have to be smart or this won't work.
+
 Your objective was this:
 {input}
 
 Your original plan was this:
-{plan}
+{plan}""",
+        ),
+        (
+            "human",
+            """You have currently done the follow steps:
+{past_steps}""",
+        ),
+    ]
+)
 
-You have currently done the follow steps:
-{past_steps}
 
-Update your plan accordingly. If no more steps are needed and you can return to the user, then respond with that. Otherwise, fill out the plan. Only add steps to the plan that still NEED to be done. Do not return previously done steps as part of the plan.
-When you are done return with a Response action, not a Plan action please. If there are still plan items unaccounted for, proceed with a Plan action. 
-Reason extremely briefly in reasoning. Seriously just think like 10-20 words and that's it. It's only there so you don't say Response action and then want to list a plan.
-If it's a plan, use Plan aka action.steps . Unless the user is asking for a plan then you'll just have to be smart or this won't work.
-"""
+def get_replanner(llm):
+    replanner = _REPLANNER_PROMPT | llm.with_structured_output(Act)
+    return replanner
 
-    )
+# Search-result TTL cache shared across plan steps and threads: identical
+# queries inside the window reuse the serialized results and skip the
+# SearxNG HTTP round-trip entirely. Search results go stale in minutes,
+# not seconds, so a 10-minute window is safe for this workload.
+_SEARCH_CACHE_MAX = 1024
+_SEARCH_CACHE_TTL = 600.0
+_search_cache: OrderedDict = OrderedDict()
+
+
+class CachedSearxSearchResults(SearxSearchResults):
+    """SearxSearchResults fronted by a TTL LRU keyed on the query.
+
+    Keys are whitespace/case-normalized to collapse trivial variants of
+    the same query that the agent tends to emit across replan loops.
+    """
+
+    def _cache_key(self, query: str):
+        return (" ".join(query.lower().split()), self.num_results)
+
+    @staticmethod
+    def _cache_get(key):
+        hit = _search_cache.get(key)
+        if hit is None:
+            return None
+        result, expires = hit
+        if time.monotonic() >= expires:
+            del _search_cache[key]
+            return None
+        _search_cache.move_to_end(key)
+        return result
+
+    @staticmethod
+    def _cache_put(key, result) -> None:
+        _search_cache[key] = (result, time.monotonic() + _SEARCH_CACHE_TTL)
+        _search_cache.move_to_end(key)
+        while len(_search_cache) > _SEARCH_CACHE_MAX:
+            _search_cache.popitem(last=False)
+
+    def _run(self, query: str, run_manager=None) -> str:
+        key = self._cache_key(query)
+        result = self._cache_get(key)
+        if result is None:
+            result = super()._run(query, run_manager=run_manager)
+            self._cache_put(key, result)
+        return result
+
+    async def _arun(self, query: str, run_manager=None) -> str:
+        key = self._cache_key(query)
+        result = self._cache_get(key)
+        if result is None:
+            result = await super()._arun(query, run_manager=run_manager)
+            self._cache_put(key, result)
+        return result
 
-    replanner = replanner_prompt | llm.with_structured_output(Act)
-    return replanner
 
 def get_searxng_tool(num_results=3):
     wrapper = SearxSearchWrapper(searx_host=f"{settings.searxng_host}:{settings.searxng_port}", unsecure=True)
-    return SearxSearchResults(wrapper=wrapper, num_results=num_results)
+    return CachedSearxSearchResults(wrapper=wrapper, num_results=num_results)
     
 
+@lru_cache(maxsize=None)
 def get_llm(model):
+    # One client per model name for the whole process: the planner,
+    # replanner and react agent all reuse the same ChatOpenAI instance,
+    # and with it one warm httpx connection pool instead of one each.
     return ChatOpenAI(
         model=model,
         base_url=settings.openai_base_url, 
@@ -92,32 +179,123 @@ planner = get_planner(llm)
 replanner = get_replanner(llm)
 agent_executor = create_execute_agent(model='claude4_sonnet', num_results=3)
 
+# Plan-template cache ("execution memory"): structurally identical objectives
+# reuse the previously generated steps instead of invoking the planner again.
+_PLAN_CACHE_MAX = 256
+_plan_cache: OrderedDict = OrderedDict()
+
+# Replanner memo: the replanner's decision is a function of (objective,
+# remaining plan, completed steps), all hashable, so identical states —
+# retried threads, repeated demo scenarios — reuse the parsed Act without
+# re-rendering the prompt or re-parsing structured output. Sits above the
+# LLM-level cache, which only saves the provider round-trip.
+_REPLAN_CACHE_MAX = 256
+_replan_cache: OrderedDict = OrderedDict()
+
+
+@lru_cache(maxsize=1024)
+def _objective_fingerprint(objective: str) -> str:
+    """Case- and whitespace-insensitive fingerprint of an objective.
+
+    Memoized so the same message fingerprinted from multiple nodes (or
+    repeated turns on a thread) is normalized once; this is also the hook
+    for a shared embedding cache if the plan cache ever goes semantic.
+    """
+    return " ".join(objective.lower().split())
+
+
+# Heuristic classifier for inputs that don't need a multi-step plan:
+# short messages with no tool/research intent (greetings, "what is 2+2").
+_TRIVIAL_MAX_WORDS = 12
+_TOOL_INTENT_RE = re.compile(
+    r"\b(search|find|look up|research|compare|plan|book|flight|latest|news|current|today)\b",
+    re.IGNORECASE,
+)
+
+
+def _is_trivial_query(objective: str) -> bool:
+    return len(objective.split()) <= _TRIVIAL_MAX_WORDS and not _TOOL_INTENT_RE.search(objective)
+
 async def execute_step(state: PlanExecute):
     plan = state["plan"]
+    if not plan:
+        # Nothing left to execute — skip the agent LLM call entirely and
+        # hand straight back to the replanner, which emits the final Response.
+        return Command(
+            update={"past_steps": [("", "Answer the user with Response action.")]},
+            goto="replan_step",
+        )
     plan_str = "\n".join(f"{i + 1}. {step}" for i, step in enumerate(plan))
-    if len(plan) < 1:
-        task = "Answer the user with Response action."
-    else:
-        task = plan[0]
-    task_formatted = f"""For the following plan:
-{plan_str}\n\nYou are tasked with executing step {1}, {task}."""
-    agent_response = await agent_executor.ainvoke(
-        {"messages": [("user", task_formatted)]}
-    )
+    # Drain up to plan_batch_size steps before going back to the
+    # replanner, amortizing one replanner LLM call across the batch.
+    # Each step's agent only ever sees the plan text plus its own task —
+    # never earlier results — so executing several in sequence gives the
+    # agent exactly the same context as one-step-per-loop did.
+    past_steps = []
+    for i, task in enumerate(plan[:settings.plan_batch_size]):
+        task_formatted = f"""For the following plan:
+{plan_str}\n\nYou are tasked with executing step {i + 1}, {task}."""
+        agent_response = await agent_executor.ainvoke(
+            {"messages": [("user", task_formatted)]}
+        )
+        past_steps.append((task, agent_response["messages"][-1].content))
     return Command(
-        update={"past_steps": [(task, agent_response["messages"][-1].content)]},
+        update={"past_steps": past_steps},
         goto="replan_step",
     )
 
 
 async def plan_step(state: PlanExecute):
+    if _is_trivial_query(state["input"]):
+        # Skip the planner LLM call: a one-step plan sends the input straight
+        # to the executor, and the replanner wraps up with a Response.
+        return Command(update={"plan": [state["input"]]}, goto="execute_step")
+    fingerprint = _objective_fingerprint(state["input"])
+    cached_steps = _plan_cache.get(fingerprint)
+    if cached_steps is not None:
+        _plan_cache.move_to_end(fingerprint)
+        return Command(update={"plan": list(cached_steps)}, goto="execute_step")
     plan = await planner.ainvoke({"messages": [("user", state["input"])]})
+    _plan_cache[fingerprint] = list(plan.steps)
+    if len(_plan_cache) > _PLAN_CACHE_MAX:
+        _plan_cache.popitem(last=False)
     return Command(update={"plan": plan.steps}, goto="execute_step")
 
 
+# Completed steps shown to the replanner: collapse exact duplicates into one
+# entry tagged with an attempt count, then keep only this many of the most
+# recent — prompt tokens otherwise grow linearly with loop count. The count
+# tag matters beyond brevity: it keeps the prompt (and with it the memo and
+# LLM-cache keys) changing on every loop even when the underlying steps
+# repeat verbatim. Silently dropping duplicates froze those keys, so a
+# cached Plan fed a cached execution fed the same cached Plan — a zero-LLM
+# spin to the recursion limit — and it also tells the replanner it is
+# retreading ground, which is exactly when it should cut over to a Response.
+_REPLAN_PAST_STEPS_MAX = 10
+
+
 async def replan_step(state: PlanExecute):
-    output = await replanner.ainvoke(state)
-    if isinstance(output.action, Response):
+    counts: OrderedDict = OrderedDict()
+    for s in state["past_steps"]:
+        # On any turn after the first, state comes back from the Postgres
+        # checkpoint and the serializer has turned these (task, result)
+        # tuples into lists — unhashable as-is, so normalize before counting.
+        s = tuple(s)
+        counts[s] = counts.get(s, 0) + 1
+    past_steps = [
+        (f"{task} (attempted {n} times)" if n > 1 else task, result)
+        for (task, result), n in list(counts.items())[-_REPLAN_PAST_STEPS_MAX:]
+    ]
+    cache_key = (state["input"], tuple(state["plan"]), tuple(past_steps))
+    output = _replan_cache.get(cache_key)
+    if output is not None:
+        _replan_cache.move_to_end(cache_key)
+    else:
+        output = await replanner.ainvoke({**state, "past_steps": past_steps})
+        _replan_cache[cache_key] = output
+        if len(_replan_cache) > _REPLAN_CACHE_MAX:
+            _replan_cache.popitem(last=False)
+    if output.action.kind == "response":
         return Command(update={"response": output.action.response}, goto=END)
     else:
         return Command(update={"plan": output.action.steps}, goto="execute_step")
@@ -1,5 +1,5 @@
 import logging
-from typing import Dict, Any
+from typing import Any, AsyncGenerator, Dict
 
 from psycopg_pool import AsyncConnectionPool
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
@@ -8,51 +8,105 @@ from langgraph.graph import StateGraph, START
 
 from plan_execute.agent.models import ChatRequest, ChatResponse, PlanExecute
 from plan_execute.agent.nodes import plan_step, execute_step, replan_step
+from plan_execute.agent.buffered_checkpointer import BufferedAsyncPostgresSaver
+from plan_execute.agent.sse import DONE_FRAME, sse_event
 
 logger = logging.getLogger("service")
 
+# Advisory-lock key shared by every worker; serializes checkpointer DDL
+# at boot so a fleet starting at once doesn't stampede Postgres with
+# concurrent CREATE statements.
+_SETUP_LOCK_KEY = 0x706C616E  # "plan"
+
 from dotenv import load_dotenv
 from langfuse.langchain import CallbackHandler
  
 # Initialize Langfuse CallbackHandler for Langchain (tracing)
 langfuse_handler = CallbackHandler()
+
+
+def get_graph(checkpointer: AsyncPostgresSaver):
+    """
+    Build and compile the plan-execute workflow exactly once.
+
+    Compiling a StateGraph is pure CPU (node registration, pydantic
+    validation), so callers must do this at start-up and share the
+    returned runnable — never per request.
+    """
+    workflow = StateGraph(PlanExecute)
+
+    workflow.add_node("plan_step", plan_step)
+    workflow.add_node("execute_step", execute_step)
+    workflow.add_node("replan_step", replan_step)
+
+    workflow.add_edge(START, "plan_step")
+
+    return workflow.compile(checkpointer=checkpointer)
+
+
 class PlanExecuteService:
     """
     Thin wrapper that owns the compiled LangGraph and the checkpointer
     so FastAPI does not have to know anything about LangGraph internals.
+
+    Lifecycle contract: construct exactly once per process in the FastAPI
+    lifespan, passing the shared long-lived connection pool, and call
+    initialize() once. Never instantiate (or open a pool) per request —
+    that would pay connection setup + auth on every /chat and defeat the
+    warm pool entirely.
     """
 
-    def __init__(self, pool: AsyncConnectionPool) -> None:
-        self.checkpointer = AsyncPostgresSaver(pool)
+    def __init__(self, pool: AsyncConnectionPool, checkpoint_mode: str = "end_of_workflow") -> None:
+        # "end_of_workflow" buffers checkpoints in memory and commits once
+        # per run; "per_step" keeps the stock per-super-step behaviour.
+        self.pool = pool
+        self.checkpoint_mode = checkpoint_mode
+        if checkpoint_mode == "end_of_workflow":
+            self.checkpointer = BufferedAsyncPostgresSaver(pool)
+        else:
+            self.checkpointer = AsyncPostgresSaver(pool)
         self.graph = self._build_graph()
+        # Per-request config only varies in the thread-scoped keys; the
+        # static part (recursion limit, callback list) is built once here.
+        self._config_template = {
+            "recursion_limit": 50,
+            "callbacks": [langfuse_handler],
+        }
 
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
     def _build_graph(self):
         """Compile the LangGraph workflow once and return the runnable."""
-        workflow = StateGraph(PlanExecute)
-
-        workflow.add_node("plan_step", plan_step)
-        workflow.add_node("execute_step", execute_step)
-        workflow.add_node("replan_step", replan_step)
-
-        workflow.add_edge(START, "plan_step")
-
-        return workflow.compile(checkpointer=self.checkpointer)
+        return get_graph(self.checkpointer)
 
     async def initialize(self) -> None:
-        """One-time DB setup; call once at start-up."""
-        try:
-            await self.checkpointer.setup()
-        except Exception as e:
-            if "CREATE INDEX CONCURRENTLY cannot run inside a transaction block" in str(e):
-                logger.warning("Concurrent index creation failed, trying alternative setup")
-                # Try to setup without concurrent index creation
-                # The checkpointer should work even if indexes aren't created concurrently
-                pass
-            else:
-                raise
+        """One-time DB setup; call once at start-up.
+
+        The advisory lock makes the DDL run one worker at a time: the
+        first to boot does the real work, later workers re-run the same
+        idempotent setup against existing objects in milliseconds instead
+        of racing identical CREATEs. The lock is transaction-scoped
+        (pg_advisory_xact_lock) rather than session-scoped on purpose:
+        behind a transaction-pooling pgbouncer the lock and unlock of a
+        session lock can land on different server connections, which
+        either deadlocks or unlocks nothing. A xact lock is pinned to the
+        one connection that holds the transaction and releases itself at
+        commit, so it behaves the same with or without the proxy.
+        """
+        async with self.pool.connection() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock(%s)", (_SETUP_LOCK_KEY,))
+                try:
+                    await self.checkpointer.setup()
+                except Exception as e:
+                    if "CREATE INDEX CONCURRENTLY cannot run inside a transaction block" in str(e):
+                        logger.warning("Concurrent index creation failed, trying alternative setup")
+                        # Try to setup without concurrent index creation
+                        # The checkpointer should work even if indexes aren't created concurrently
+                        pass
+                    else:
+                        raise
 
     async def chat(self, req: ChatRequest) -> ChatResponse:
         """
@@ -64,33 +118,62 @@ class PlanExecuteService:
         logger.info("Processing thread_id=%s message=%r", req.thread_id, req.message)
 
         config = {
-            "recursion_limit": 50, 
-            "configurable": {"thread_id": req.thread_id}, 
-            "callbacks": [langfuse_handler], 
-            "metadata": {"langfuse_session_id": req.thread_id}
+            **self._config_template,
+            "configurable": {"thread_id": req.thread_id},
+            "metadata": {"langfuse_session_id": req.thread_id},
         }
         inputs: Dict[str, str] = {"input": req.message}
 
         final_state: Dict[str, Any] | None = None
         try:
-            async for event in self.graph.astream(inputs, config=config):
-                final_state = event
-                if "__end__" in event:
-                    break
+            # The endpoint returns a single JSON response, so there is no
+            # reason to pay the per-node async-for overhead of astream just
+            # to capture the final state.
+            final_state = await self.graph.ainvoke(inputs, config=config)
         except Exception as exc:
             logger.exception("Graph execution failed")
             raise Exception("Pipeline failure") from exc
+        finally:
+            if isinstance(self.checkpointer, BufferedAsyncPostgresSaver):
+                await self.checkpointer.aflush(req.thread_id)
 
         response_text = None
-        if final_state:
-            if "response" in final_state:
-                response_text = str(final_state["response"])
-            elif "replan_step" in final_state and "response" in final_state["replan_step"]:
-                response_text = str(final_state["replan_step"]["response"])
+        if final_state and final_state.get("response"):
+            response_text = str(final_state["response"])
 
         if not response_text:
             logger.error("No response generated. final_state=%s", final_state)
             raise Exception("No response generated")
 
         logger.info("Returning response for thread_id=%s: %r", req.thread_id, response_text)
-        return ChatResponse(response=response_text)
\ No newline at end of file
+        return ChatResponse(response=response_text)
+
+    async def chat_stream(self, req: ChatRequest) -> AsyncGenerator[bytes, None]:
+        """
+        Stream each node's state update as an SSE event.
+
+        Unlike chat(), nothing is buffered server-side: every plan /
+        execute / replan update goes to the client the moment the node
+        finishes, so first output arrives after the planner instead of
+        after the whole run, and memory stays flat however long the plan
+        gets. chat() remains the blocking single-JSON variant.
+        """
+        logger.info("Streaming thread_id=%s message=%r", req.thread_id, req.message)
+
+        config = {
+            **self._config_template,
+            "configurable": {"thread_id": req.thread_id},
+            "metadata": {"langfuse_session_id": req.thread_id},
+        }
+        inputs: Dict[str, str] = {"input": req.message}
+
+        try:
+            async for update in self.graph.astream(inputs, config=config, stream_mode="updates"):
+                yield sse_event(update)
+        except Exception:
+            logger.exception("Graph stream execution failed")
+            yield sse_event({"error": "Pipeline failure"})
+        finally:
+            if isinstance(self.checkpointer, BufferedAsyncPostgresSaver):
+                await self.checkpointer.aflush(req.thread_id)
+        yield DONE_FRAME
\ No newline at end of file
@@ -1,6 +1,7 @@
 import logging
-import json
 import time
+
+import orjson
 from typing import Dict, Any, AsyncGenerator
 from typing_extensions import TypedDict
 
@@ -13,6 +14,7 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage, AIMessage
 
 from plan_execute.agent.models import ChatRequest
+from plan_execute.agent.sse import DONE_FRAME, content_frame_template, sse_event
 from plan_execute.config import settings
 
 from langfuse.langchain import CallbackHandler
@@ -92,11 +94,13 @@ class SimpleAgentService:
                 if chunk.content:
                     full_response += chunk.content
             
-            # Add the assistant's response to the message history
-            updated_messages = messages + [AIMessage(content=full_response)]
+            # Add the assistant's response to the message history in place;
+            # `messages` is this request's loaded copy, so no defensive
+            # O(N) list rebuild is needed.
+            messages.append(AIMessage(content=full_response))
             
             return {
-                "messages": updated_messages,
+                "messages": messages,
                 "response": full_response
             }
             
@@ -104,9 +108,10 @@ class SimpleAgentService:
             logger.error(f"Error in respond node: {e}")
             error_response = f"I'm sorry, I encountered an error: {str(e)}"
             # Still update messages even on error
-            updated_messages = state.get("messages", []) + [AIMessage(content=error_response)]
+            messages = state.get("messages", [])
+            messages.append(AIMessage(content=error_response))
             return {
-                "messages": updated_messages, 
+                "messages": messages, 
                 "response": error_response
             }
 
@@ -118,7 +123,7 @@ class SimpleAgentService:
             logger.error(f"Error initializing checkpointer: {e}")
             raise e
 
-    async def chat_stream(self, req: ChatRequest) -> AsyncGenerator[str, None]:
+    async def chat_stream(self, req: ChatRequest) -> AsyncGenerator[bytes, None]:
         """
         Stream chat responses back to the client with proper state persistence.
         
@@ -128,16 +133,17 @@ class SimpleAgentService:
         logger.info("Processing streaming chat for thread_id=%s message=%r", req.thread_id, req.message)
         
         # Validate message
-        if not req.message or not req.message.strip():
+        if not req.message or req.message.isspace():
             logger.warning("Empty message received, providing default response")
             error_response = "I didn't receive a message. Please type something and try again."
             
             # Return a simple error response in streaming format
-            chunk_id = f"chatcmpl-{int(time.time())}"
+            created = int(time.time())
+            chunk_id = f"chatcmpl-{created}"
             initial_chunk = {
                 "id": chunk_id,
                 "object": "chat.completion.chunk",
-                "created": int(time.time()),
+                "created": created,
                 "model": "claude4_sonnet",
                 "choices": [{
                     "index": 0,
@@ -145,12 +151,12 @@ class SimpleAgentService:
                     "finish_reason": None
                 }]
             }
-            yield f"data: {json.dumps(initial_chunk)}\n\n"
+            yield sse_event(initial_chunk)
             
             content_chunk = {
                 "id": chunk_id,
                 "object": "chat.completion.chunk",
-                "created": int(time.time()),
+                "created": created,
                 "model": "claude4_sonnet",
                 "choices": [{
                     "index": 0,
@@ -158,12 +164,12 @@ class SimpleAgentService:
                     "finish_reason": None
                 }]
             }
-            yield f"data: {json.dumps(content_chunk)}\n\n"
+            yield sse_event(content_chunk)
             
             final_chunk = {
                 "id": chunk_id,
                 "object": "chat.completion.chunk",
-                "created": int(time.time()),
+                "created": created,
                 "model": "claude4_sonnet",
                 "choices": [{
                     "index": 0,
@@ -171,8 +177,8 @@ class SimpleAgentService:
                     "finish_reason": "stop"
                 }]
             }
-            yield f"data: {json.dumps(final_chunk)}\n\n"
-            yield "data: [DONE]\n\n"
+            yield sse_event(final_chunk)
+            yield DONE_FRAME
             return
         
         try:
@@ -190,9 +196,10 @@ class SimpleAgentService:
                 # If no previous state, start with empty messages
                 existing_messages = []
             
-            # Add the new user message
-            new_user_message = HumanMessage(content=req.message)
-            all_messages = existing_messages + [new_user_message]
+            # Add the new user message in place — existing_messages is a
+            # per-request snapshot, so appending doesn't need a copy
+            all_messages = existing_messages
+            all_messages.append(HumanMessage(content=req.message))
             
             logger.info(f"Thread ID: {req.thread_id}")
             logger.info(f"Retrieved {len(existing_messages)} existing messages from state")
@@ -222,15 +229,20 @@ class SimpleAgentService:
             
             logger.debug(f"Raw messages for LLM: {llm_messages}")
             
-            # Stream directly from LLM in OpenAI-compatible format
+            # Stream directly from LLM in OpenAI-compatible format. The
+            # content frame is pre-rendered once; the token loop below only
+            # encodes the token text and splices it in.
+            # One timestamp per request; every chunk in the stream shares it
             response_content = ""
-            chunk_id = f"chatcmpl-{int(time.time())}"
+            created = int(time.time())
+            chunk_id = f"chatcmpl-{created}"
+            frame_head, frame_tail = content_frame_template(chunk_id, created, "claude4_sonnet")
             
             # Send initial chunk
             initial_chunk = {
                 "id": chunk_id,
                 "object": "chat.completion.chunk",
-                "created": int(time.time()),
+                "created": created,
                 "model": "claude4_sonnet",
                 "choices": [{
                     "index": 0,
@@ -238,33 +250,22 @@ class SimpleAgentService:
                     "finish_reason": None
                 }]
             }
-            yield f"data: {json.dumps(initial_chunk)}\n\n"
+            yield sse_event(initial_chunk)
             
             # Stream content chunks
             async for chunk in self.llm.astream(llm_messages): #, config=dict(callbacks=[langfuse_handler])):
                 if chunk.content:
                     response_content += chunk.content
                     logger.debug(f"Streaming chunk: {repr(chunk.content)}")
-                    
-                    # OpenAI-compatible streaming chunk
-                    streaming_chunk = {
-                        "id": chunk_id,
-                        "object": "chat.completion.chunk",
-                        "created": int(time.time()),
-                        "model": "claude4_sonnet",
-                        "choices": [{
-                            "index": 0,
-                            "delta": {"content": chunk.content},
-                            "finish_reason": None
-                        }]
-                    }
-                    yield f"data: {json.dumps(streaming_chunk)}\n\n"
+
+                    # Splice the token into the pre-rendered frame
+                    yield frame_head + orjson.dumps(chunk.content) + frame_tail
             
             # Send final chunk
             final_chunk = {
                 "id": chunk_id,
                 "object": "chat.completion.chunk",
-                "created": int(time.time()),
+                "created": created,
                 "model": "claude4_sonnet",
                 "choices": [{
                     "index": 0,
@@ -272,10 +273,11 @@ class SimpleAgentService:
                     "finish_reason": "stop"
                 }]
             }
-            yield f"data: {json.dumps(final_chunk)}\n\n"
+            yield sse_event(final_chunk)
             
             # Save the conversation to state after streaming - use the graph to maintain state
-            final_messages = all_messages + [AIMessage(content=response_content)]
+            all_messages.append(AIMessage(content=response_content))
+            final_messages = all_messages
             final_inputs = {
                 "messages": final_messages,
                 "response": response_content
@@ -299,12 +301,12 @@ class SimpleAgentService:
                 # Continue anyway - the conversation still worked for this turn
             
             # Signal completion
-            yield "data: [DONE]\n\n"
+            yield DONE_FRAME
                     
         except Exception as exc:
             logger.exception("Streaming chat execution failed")
-            yield f"data: Error: {str(exc)}\n\n"
-            yield "data: [DONE]\n\n"
+            yield f"data: Error: {str(exc)}\n\n".encode()
+            yield DONE_FRAME
 
     async def chat(self, req: ChatRequest) -> SimpleChatResponse:
         """
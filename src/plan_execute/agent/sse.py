@@ -0,0 +1,99 @@
+"""
+Shared helpers for building OpenAI-compatible SSE frames as bytes.
+
+Streaming is serialization-bound in the interpreter, so frames are built
+with orjson and yielded as bytes (Starlette sends them without a re-encode).
+The per-token fast path pre-renders everything but the token text once per
+stream via content_frame_template.
+"""
+import asyncio
+
+import orjson
+
+DONE_FRAME = b"data: [DONE]\n\n"
+
+# Yielded by aiter_with_flush_ticks when the source stream has gone quiet
+# for one flush interval; callers flush their coalescing buffer and keep
+# iterating. Identity-compared, never sent to a client.
+FLUSH_TICK = object()
+
+
+async def aiter_with_flush_ticks(stream, interval: float):
+    """Iterate a stream, yielding FLUSH_TICK after `interval` seconds of silence.
+
+    A coalescing loop that only checks its time threshold when the next
+    chunk arrives holds buffered text for the whole length of any stall —
+    tool calls routinely pause an LM stream for seconds. Driving the
+    source through this wrapper makes the threshold a real timer: a tick
+    arrives at most `interval` after the last chunk, so buffered text
+    never outlives its advertised window.
+    """
+    iterator = stream.__aiter__()
+    # __anext__ runs as a task so a timeout abandons only the wait, not
+    # the in-flight step; shield keeps wait_for from cancelling it.
+    step = asyncio.ensure_future(iterator.__anext__())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(asyncio.shield(step), interval)
+            except asyncio.TimeoutError:
+                yield FLUSH_TICK
+                continue
+            except StopAsyncIteration:
+                return
+            yield item
+            step = asyncio.ensure_future(iterator.__anext__())
+    finally:
+        # Only a pending step needs reaping (early close during a tick);
+        # a finished one was already consumed by the loop above.
+        if not step.done():
+            step.cancel()
+            try:
+                await step
+            except asyncio.CancelledError:
+                pass
+
+# Envelope frames vary only in id, created, model (and the error text for
+# content frames); %-formatting into these byte templates replaces a dict
+# build plus a full JSON encode per frame.
+ROLE_FRAME_TMPL = (
+    b'data: {"id":"%b","object":"chat.completion.chunk","created":%d,"model":"%b",'
+    b'"choices":[{"index":0,"delta":{"role":"assistant","content":""},"finish_reason":null}]}\n\n'
+)
+CONTENT_FRAME_TMPL = (
+    b'data: {"id":"%b","object":"chat.completion.chunk","created":%d,"model":"%b",'
+    b'"choices":[{"index":0,"delta":{"content":%b},"finish_reason":null}]}\n\n'
+)
+FINAL_FRAME_TMPL = (
+    b'data: {"id":"%b","object":"chat.completion.chunk","created":%d,"model":"%b",'
+    b'"choices":[{"index":0,"delta":{},"finish_reason":"stop"}]}\n\n'
+)
+
+_FRAME_SENTINEL = "__TOKEN__"
+
+
+def sse_event(obj) -> bytes:
+    """Encode one SSE event with orjson; bytes go straight to Starlette."""
+    return b"data: " + orjson.dumps(obj) + b"\n\n"
+
+
+def content_frame_template(chunk_id: str, created: int, model: str):
+    """Pre-render a content SSE frame split around the delta text.
+
+    Within one stream every content frame is identical except for the token
+    itself, so the surrounding bytes are serialized once up front and each
+    token is spliced in with a single orjson string encode instead of
+    re-serializing the whole envelope per chunk.
+    """
+    head, tail = sse_event({
+        "id": chunk_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "delta": {"content": _FRAME_SENTINEL},
+            "finish_reason": None
+        }]
+    }).split(orjson.dumps(_FRAME_SENTINEL))
+    return head, tail
@@ -32,7 +32,14 @@ logger = logging.getLogger("app")
 db_uri = settings.postgres_dsn
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with AsyncConnectionPool(db_uri, open=False, kwargs=dict(autocommit=True)) as pool:
+    async with AsyncConnectionPool(
+        db_uri,
+        open=False,
+        min_size=settings.pool_min_size,
+        max_size=settings.pool_max_size,
+        max_idle=settings.pool_max_idle,
+        kwargs=dict(autocommit=True, prepare_threshold=0),
+    ) as pool:
         # Initialize all services
         plan_execute_service = PlanExecuteService(pool)
         # simple_agent_service = SimpleAgentService(pool)  # Replaced with DSPy
@@ -49,7 +56,11 @@ async def lifespan(app: FastAPI):
         app.state.simple_agent_executor = dspy_agent_service  # Use enhanced DSPy service with MCP tools
         app.state.canvas_service = canvas_service
         
-        yield
+        try:
+            yield
+        finally:
+            # Shut down the persistent MCP session before the pool goes away
+            await dspy_agent_service.aclose()
     # pool closed automatically on exit
 
 # ------------------------------------------------------------------
@@ -86,6 +97,28 @@ async def chat(req: ChatRequest) -> ChatResponse:
 # ------------------------------------------------------------------
 from fastapi.responses import StreamingResponse
 
+
+@app.post("/chat-stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Streaming variant of /chat: emits each plan/execute/replan node
+    update as an SSE event instead of buffering the whole run.
+    """
+    service: PlanExecuteService = app.state.plan_execute_executor
+    try:
+        return StreamingResponse(
+            service.chat_stream(req),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+            }
+        )
+    except Exception as exc:
+        detail = traceback.format_exc()
+        logger.exception("chat stream endpoint failed")
+        raise HTTPException(status_code=500, detail=detail)
+
 @app.options("/simple-chat-stream")
 async def simple_chat_stream_options():
     """Handle CORS preflight for simple-chat-stream"""
@@ -152,5 +185,15 @@ async def canvas_chat(req: CanvasChatRequest) -> CanvasChatResponse:
 
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run("plan_execute.app:app", host=settings.host, port=settings.port)
\ No newline at end of file
+    # uvloop + httptools move the event loop and HTTP parsing into C, and
+    # multiple workers let the CPU-bound parts scale across cores.
+    uvicorn.run(
+        "plan_execute.app:app",
+        host=settings.host,
+        port=settings.port,
+        workers=os.cpu_count(),
+        loop="uvloop",
+        http="httptools",
+    )
\ No newline at end of file
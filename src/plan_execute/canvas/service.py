@@ -1,4 +1,4 @@
-import json
+import orjson
 import logging
 from typing import Optional, Dict, Any
 from uuid import uuid4
@@ -171,7 +171,7 @@ Examples:
 
         try:
             response = await self.llm.ainvoke([HumanMessage(content=analysis_prompt)])
-            result = json.loads(response.content.strip())
+            result = orjson.loads(response.content)
             return result.get("type", "text"), result.get("language")
         except Exception as e:
             logger.warning(f"Failed to determine artifact type: {e}")
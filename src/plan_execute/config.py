@@ -14,9 +14,44 @@ class Settings(BaseSettings):
     )
     host: str = "0.0.0.0"
     port: int = 8094
+    # --- connection pool sizing (keep max below Postgres max_connections) ---
+    pool_min_size: int = 10
+    pool_max_size: int = 50
+    pool_max_idle: float = 60.0
+    # Seconds between SELECT 1 pings that keep asyncpg connections warm;
+    # idle timeout on that pool is disabled so quiet traffic never pays
+    # a reconnect on the next turn.
+    pool_keepalive_interval: float = 60.0
+    # --- streaming chunk coalescing ------------------------------
+    stream_batch_n: int = 32
+    stream_batch_ms: float = 200.0
+    # Merge token deltas into one SSE frame once this many bytes or this
+    # many milliseconds accumulate; trades ~20ms latency for far fewer
+    # frames, dict builds and TCP segments.
+    stream_coalesce_bytes: int = 256
+    stream_coalesce_ms: float = 20.0
+    # Plan steps executed per trip through execute_step before handing
+    # back to the replanner; amortizes one replanner LLM call over up to
+    # this many steps.
+    plan_batch_size: int = 3
+    # --- conversation history bounds ------------------------------
+    # Past history_max_messages, the oldest history_summary_threshold // 2
+    # turns collapse into one summary row, bounding per-turn prompt size
+    # and DB I/O on long threads.
+    history_max_messages: int = 100
+    history_summary_threshold: int = 50
     # --- secrets & endpoints you actually need --------------------
     postgres_password: SecretStr
     postgres_url: str = "localhost"
+    # Point at pgbouncer (6432) in front of Postgres when running multiple
+    # workers; prepare_threshold=0 on the psycopg pool keeps transaction
+    # pooling safe on that side.
+    postgres_port: int = 5432
+    # Set this alongside the pgbouncer DSN. Transaction pooling hands each
+    # transaction an arbitrary server connection, so asyncpg's automatic
+    # prepared statements break ("prepared statement does not exist" when
+    # the next transaction lands elsewhere); this flag turns that cache off.
+    postgres_transaction_pooling: bool = False
     phoenix_api_key: SecretStr
     phoenix_collector_endpoint: str = "http://host.docker.internal:4317"
     # phoenix_collector_http_endpoint: str = "http://host.docker.internal:6006/v1/traces"
@@ -29,7 +64,7 @@ class Settings(BaseSettings):
     @property
     def postgres_dsn(self) -> str:
         return (
-            f"postgresql://postgres:{self.postgres_password.get_secret_value()}@{self.postgres_url}:5432/langgraph"
+            f"postgresql://postgres:{self.postgres_password.get_secret_value()}@{self.postgres_url}:{self.postgres_port}/langgraph"
         )
 
 settings = Settings()
\ No newline at end of file
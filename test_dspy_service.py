@@ -139,13 +139,14 @@ async def test_dspy_checkpointer():
     print("\n🧪 Testing DSPy Checkpointer")
     print("=" * 50)
     
-    db_uri = settings.postgres_dsn
-    async with AsyncConnectionPool(db_uri, open=False, kwargs=dict(autocommit=True)) as pool:
+    from plan_execute.agent.dspy_checkpointer import DSPyConversationCheckpointer
+    import dspy
+
+    # The checkpointer is asyncpg-backed and opens its own pool from a DSN;
+    # it defaults to settings.postgres_dsn.
+    checkpointer = DSPyConversationCheckpointer()
+    try:
         try:
-            from plan_execute.agent.dspy_checkpointer import DSPyConversationCheckpointer
-            import dspy
-            
-            checkpointer = DSPyConversationCheckpointer(pool)
             await checkpointer.setup()
             
             # Test saving and loading history
@@ -186,6 +187,8 @@ async def test_dspy_checkpointer():
             import traceback
             traceback.print_exc()
             return False
+    finally:
+        await checkpointer.aclose()
 
 
 if __name__ == "__main__":
@@ -7,25 +7,34 @@ import asyncio
 import httpx
 from plan_execute.config import settings
 
+# One shared client for the whole process: connection setup (TCP + TLS)
+# is paid once and kept-alive connections are reused across calls, which
+# matters when this module is used for load testing.
+_client = httpx.AsyncClient(
+    timeout=600,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+)
+
 async def chat(message: str, thread_id: str = "test") -> str:
     url = f"http://localhost:{settings.port}/chat"
     payload = {"message": message, "thread_id": thread_id}
-    async with httpx.AsyncClient(timeout=600) as client:
-        r = await client.post(url, json=payload)
-        r.raise_for_status()
-        return r.json()["response"]
+    r = await _client.post(url, json=payload)
+    r.raise_for_status()
+    return r.json()["response"]
 
 
 async def main():
     try:
         answer = await chat(
-            "Come up with a plan for taking over the world of medical documentation with high quality question answer agents without using search. Be brief.", 
+            "Come up with a plan for taking over the world of medical documentation with high quality question answer agents without using search. Be brief.",
             thread_id="8",
         )
         print("🤖", answer)
     except Exception as e:
         print("❌", e)
+    finally:
+        await _client.aclose()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
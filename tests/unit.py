@@ -6,7 +6,7 @@ but with the real Postgres checkpointer (no FastAPI, no HTTP).
 
 import asyncio
 from plan_execute.config import settings
-from plan_execute import get_graph
+from plan_execute.agent.service import get_graph
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 
 